@@ -1,3 +1,4 @@
+import functools
 import os
 from dataclasses import dataclass
 
@@ -9,12 +10,23 @@ class AppConfig:
     data_tab_name: str
     users_tab_name: str
     notifications_tab_name: str
-    admin_usernames: list[str]
-    admin_user_ids: list[int]
+    admin_usernames: frozenset[str]
+    admin_user_ids: frozenset[int]
     channel_id: str | None
     google_credentials_path: str | None
+    webhook_url: str | None
+    webhook_port: int
+    webhook_secret: str | None
 
 
+def _parse_int(text: str) -> int | None:
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
 def load_config() -> AppConfig:
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
@@ -25,19 +37,18 @@ def load_config() -> AppConfig:
     users_tab_name = os.getenv("USERS_TAB_NAME", "Users")
     notifications_tab_name = os.getenv("NOTIFICATIONS_TAB_NAME", "Notifications")
     admin_usernames_env = os.getenv("ADMIN_USERNAMES", "")
-    admin_usernames = [u.strip().lstrip("@").lower() for u in admin_usernames_env.split(",") if u.strip()]
+    admin_usernames = frozenset(u.strip().lstrip("@").lower() for u in admin_usernames_env.split(",") if u.strip())
     admin_user_ids_env = os.getenv("ADMIN_USER_IDS", "")
-    admin_user_ids: list[int] = []
-    for v in admin_user_ids_env.split(","):
-        v = v.strip()
-        if not v:
-            continue
-        try:
-            admin_user_ids.append(int(v))
-        except ValueError:
-            pass
+    # Malformed ids are skipped
+    admin_user_ids = frozenset(
+        i for i in (_parse_int(v) for v in admin_user_ids_env.split(",")) if i is not None
+    )
     channel_id = os.getenv("CHANNEL_ID")  # can be @channel_username or numeric id
     google_credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    webhook_url = os.getenv("WEBHOOK_URL")  # public https URL; unset = long polling
+    webhook_port_env = os.getenv("PORT", "8443").strip()
+    webhook_port = int(webhook_port_env) if webhook_port_env.isdigit() else 8443
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
 
     return AppConfig(
         telegram_bot_token=token,
@@ -49,6 +60,12 @@ def load_config() -> AppConfig:
         admin_user_ids=admin_user_ids,
         channel_id=channel_id,
         google_credentials_path=google_credentials_path,
+        webhook_url=webhook_url,
+        webhook_port=webhook_port,
+        webhook_secret=webhook_secret,
     )
 
 
+def reset_config() -> None:
+    """Drop the cached config so the next load_config() re-reads the environment."""
+    load_config.cache_clear()
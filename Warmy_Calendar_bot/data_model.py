@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import datetime as dt
+import functools
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 
 EVENT_MAP: Dict[str, str] = {
@@ -21,8 +22,14 @@ EVENT_LABEL_LT: Dict[str, str] = {
     "registration_certificate": "Registracijos liudijimas",
 }
 
+# Returned as-is when there is nothing to report, so callers can test it by identity
+EMPTY_SUMMARY_LT = "Šiandien priminimų nėra."
 
-@dataclass
+DATE_MIN = dt.date.min
+TS_MIN = dt.datetime.min
+
+
+@dataclass(slots=True, frozen=True)
 class DeadlineRecord:
     plate: str
     event_type: str
@@ -30,64 +37,77 @@ class DeadlineRecord:
 
 
 def normalize_event(event_raw: str) -> str | None:
-    key = EVENT_MAP.get(event_raw.strip())
-    return key
+    # Most Sheets values are already clean; only strip on a miss
+    key = EVENT_MAP.get(event_raw)
+    if key is not None:
+        return key
+    return EVENT_MAP.get(event_raw.strip())
+
 
+@functools.lru_cache(maxsize=1024)
+def parse_iso_date(text: str) -> dt.date | None:
+    # Stored expiries repeat across vehicles and requests; parse each distinct string once
+    try:
+        return dt.date.fromisoformat(text[:10])
+    except ValueError:
+        return None
 
-def latest_by_plate_event(records: List[Tuple[str, str, dt.date | None, dt.datetime | None]]) -> List[DeadlineRecord]:
-    buckets: Dict[Tuple[str, str], Tuple[dt.date | None, dt.datetime | None]] = {}
+
+def latest_by_plate_event(records: Iterable[Tuple[str, str, dt.date | None, dt.datetime | None]]) -> List[DeadlineRecord]:
+    buckets: Dict[Tuple[str, str], Tuple[Tuple[dt.date, dt.datetime], dt.date | None]] = {}
     for plate, event_type, expiry, ts in records:
         k = (plate, event_type)
-        prev = buckets.get(k)
-        if prev is None:
-            buckets[k] = (expiry, ts)
-        else:
-            prev_expiry, prev_ts = prev
-            # Choose greater expiry; tie-breaker by newer timestamp
-            if (expiry or dt.date.min) > (prev_expiry or dt.date.min):
-                buckets[k] = (expiry, ts)
-            elif (expiry == prev_expiry) and (ts and ((prev_ts is None) or ts > prev_ts)):
-                buckets[k] = (expiry, ts)
-
-    result: List[DeadlineRecord] = []
-    for (plate, event_type), (expiry, _) in buckets.items():
-        result.append(DeadlineRecord(plate=plate, event_type=event_type, expiry_date=expiry))
-    return result
+        # Greater expiry wins; tie-breaker by newer timestamp
+        rank = (expiry or DATE_MIN, ts or TS_MIN)
+        cur = buckets.get(k)
+        if cur is None or rank > cur[0]:
+            buckets[k] = (rank, expiry)
+
+    return [
+        DeadlineRecord(plate=plate, event_type=event_type, expiry_date=expiry)
+        for (plate, event_type), (_, expiry) in buckets.items()
+    ]
 
 
 def compute_windows(today: dt.date, records: List[DeadlineRecord]) -> Tuple[List[DeadlineRecord], List[DeadlineRecord]]:
     upcoming: List[DeadlineRecord] = []
     expired: List[DeadlineRecord] = []
+    # Compare against precomputed target dates instead of building a timedelta per record
+    reminder_dates = {today + dt.timedelta(days=5), today + dt.timedelta(days=1)}
     for r in records:
-        if r.event_type == "registration_certificate":
+        expiry = r.expiry_date
+        if not expiry or r.event_type == "registration_certificate":
             continue
-        if not r.expiry_date:
-            continue
-        delta = (r.expiry_date - today).days
-        if delta in (5, 1):
+        if expiry in reminder_dates:
             upcoming.append(r)
-        elif delta < 0:
+        elif expiry < today:
             expired.append(r)
     return upcoming, expired
 
 
+def _prepare_rows(records: List[DeadlineRecord]) -> List[Tuple[dt.date, str, str, str, str]]:
+    # Resolve label and date string once per record; plain tuple sort avoids a key lambda
+    rows = []
+    for r in records:
+        d = r.expiry_date or DATE_MIN
+        rows.append((d, r.plate, r.event_type, EVENT_LABEL_LT.get(r.event_type, r.event_type), d.isoformat()))
+    rows.sort()
+    return rows
+
+
 def format_summary_lt(upcoming: List[DeadlineRecord], expired: List[DeadlineRecord]) -> str:
     lines: List[str] = []
     if upcoming:
         lines.append("Artėjantys (5 d., 1 d.):")
-        for r in sorted(upcoming, key=lambda x: (x.expiry_date or dt.date.min, x.plate, x.event_type)):
-            label = EVENT_LABEL_LT.get(r.event_type, r.event_type)
-            date_str = (r.expiry_date or dt.date.min).isoformat()
-            lines.append(f"{r.plate} — {label} — {date_str}")
+        for _, plate, _, label, date_str in _prepare_rows(upcoming):
+            lines.append(f"{plate} — {label} — {date_str}")
         lines.append("")
     if expired:
         lines.append("Nebegalioja:")
-        for r in sorted(expired, key=lambda x: (x.expiry_date or dt.date.min, x.plate, x.event_type)):
-            label = EVENT_LABEL_LT.get(r.event_type, r.event_type)
-            date_str = (r.expiry_date or dt.date.min).isoformat()
-            lines.append(f"{r.plate} — {label} — nebegalioja nuo {date_str}")
+        for _, plate, _, label, date_str in _prepare_rows(expired):
+            lines.append(f"{plate} — {label} — nebegalioja nuo {date_str}")
     if not lines:
-        return "Šiandien priminimų nėra."
+        return EMPTY_SUMMARY_LT
     return "\n".join(lines)
 
 
@@ -4,58 +4,95 @@ Handles daily updates and manual refresh commands.
 """
 
 import asyncio
-import subprocess
 import datetime as dt
+import functools
+import logging
+import time
 from typing import List, Tuple, Optional
 from .config import load_config
-from .sheets_client import SheetsClient
 from .data_model import normalize_event
 from .json_storage import JSONStorage
-from .users_repo import UsersRepo
+from .sheets_client import SheetsClient, get_sheets_client, run_sheets_call
+
+logger = logging.getLogger(__name__)
 
 cfg = load_config()
 
+
+@functools.lru_cache(maxsize=4096)
+def _parse_us_timestamp(text: str) -> dt.datetime:
+    """Parse a Sheets "MM/DD/YYYY HH:MM:SS" timestamp without going through strptime"""
+    date_part, time_part = text.split(" ", 1)
+    month, day, year = date_part.split("/")
+    hour, minute, second = time_part.split(":")
+    return dt.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+
+
+def _normalize_rows(raw, parse_expiry) -> List[Tuple]:
+    """Turn Sheets rows into (plate, event_type, expiry, timestamp, doc_links) tuples, skipping unknown events"""
+    rows = []
+    for r in raw:
+        ev = normalize_event(r.event_raw)
+        if not ev:
+            continue
+        # Serial-number cells arrive already converted; only text cells need parsing
+        ts = r.ts
+        if ts is None and r.timestamp:
+            try:
+                ts = _parse_us_timestamp(r.timestamp)
+            except Exception:
+                ts = None
+        expiry = r.expiry if r.expiry is not None else parse_expiry(r.expiry_raw)
+        doc_links = [link for link in (r.doc1, r.doc2) if link]
+        rows.append((r.plate, ev, expiry, ts, doc_links))
+    return rows
+
+
+# Non-forced syncs within this many seconds of the last one reuse its result
+SYNC_MIN_INTERVAL_SECONDS = 60
+
+# Rapid syncs within this window are coalesced into a single git backup
+BACKUP_DEBOUNCE_SECONDS = 300
+
 class DataSync:
     def __init__(self):
         self.storage = JSONStorage()
+        self._backup_task: Optional[asyncio.Task] = None
+        self._active_plates_cache: Optional[Tuple[int, List[str]]] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._last_sync_result: Optional[Tuple[bool, str]] = None
+        self._last_sync_at = 0.0
     
     async def sync_from_google_sheets(self, force: bool = False) -> Tuple[bool, str]:
         """
         Sync data from Google Sheets to local JSON storage.
+        Concurrent callers share one in-flight sync; without force, a sync
+        that succeeded less than SYNC_MIN_INTERVAL_SECONDS ago is reused.
         Returns (success, message)
         """
+        if self._sync_task is None or self._sync_task.done():
+            last = self._last_sync_result
+            if not force and last and last[0] and time.monotonic() - self._last_sync_at < SYNC_MIN_INTERVAL_SECONDS:
+                return last
+            self._sync_task = asyncio.create_task(self._sync_from_google_sheets())
+        # Shield so a cancelled caller doesn't cancel the sync for everyone else
+        result = await asyncio.shield(self._sync_task)
+        self._last_sync_result = result
+        self._last_sync_at = time.monotonic()
+        return result
+    
+    async def _sync_from_google_sheets(self) -> Tuple[bool, str]:
         try:
             if not (cfg.spreadsheet_id and cfg.google_credentials_path):
                 return False, "⚠️ Google Sheets configuration missing"
             
-            print("🔄 Starting Google Sheets sync...")
+            logger.info("🔄 Starting Google Sheets sync...")
             
-            # Read data from Google Sheets
-            client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-            raw = client.read_data_rows(cfg.data_tab_name)
+            # Read data from Google Sheets; the gspread calls block, so run them on the Sheets pool
+            client = await run_sheets_call(get_sheets_client, cfg.spreadsheet_id, cfg.google_credentials_path)
+            raw = await run_sheets_call(client.read_data_rows, cfg.data_tab_name)
             
-            # Process and normalize data with document links
-            raw_tuples = []
-            for r in raw:
-                ev = normalize_event(r.event_raw)
-                if not ev:
-                    continue
-                exp = SheetsClient.parse_mmddyyyy(r.expiry_raw)
-                ts = None
-                if r.timestamp:
-                    try:
-                        ts = dt.datetime.strptime(r.timestamp, "%m/%d/%Y %H:%M:%S")
-                    except Exception:
-                        ts = None
-                
-                # Collect document links
-                doc_links = []
-                if r.doc1:
-                    doc_links.append(r.doc1)
-                if r.doc2:
-                    doc_links.append(r.doc2)
-                
-                raw_tuples.append((r.plate, ev, exp, ts, doc_links))
+            raw_tuples = _normalize_rows(raw, SheetsClient.parse_mmddyyyy)
             
             # Update JSON storage with enhanced data
             success = self.storage.update_vehicle_data_enhanced(raw_tuples)
@@ -63,7 +100,7 @@ class DataSync:
             if success:
                 stats = self.storage.get_stats()
                 message = f"✅ Sync completed: {stats['active_vehicles']} active vehicles, {stats['excluded_vehicles']} excluded"
-                print(message)
+                logger.info(message)
                 
                 # Auto-backup to GitHub
                 await self._backup_to_github()
@@ -74,13 +111,22 @@ class DataSync:
                 
         except Exception as e:
             error_msg = f"❌ Sync failed: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             return False, error_msg
     
     async def _backup_to_github(self) -> bool:
-        """Backup JSON data to GitHub repository"""
+        """Schedule a debounced backup of the JSON data to GitHub"""
+        if self._backup_task and not self._backup_task.done():
+            # A backup is already pending and will pick up this change too
+            return True
+        self._backup_task = asyncio.create_task(self._debounced_backup())
+        return True
+    
+    async def _debounced_backup(self) -> bool:
+        """Wait out the debounce window, then commit and push the JSON file"""
+        await asyncio.sleep(BACKUP_DEBOUNCE_SECONDS)
         try:
-            print("📤 Backing up data to GitHub...")
+            logger.info("📤 Backing up data to GitHub...")
             
             # Git commands to commit and push the JSON file
             commands = [
@@ -90,62 +136,53 @@ class DataSync:
             ]
             
             for cmd in commands:
-                result = subprocess.run(cmd, capture_output=True, text=True, cwd="/opt/render/project/src")
-                if result.returncode != 0 and "nothing to commit" not in result.stdout:
-                    print(f"⚠️ Git command failed: {' '.join(cmd)} - {result.stderr}")
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd="/opt/render/project/src",
+                )
+                stdout, stderr = await proc.communicate()
+                if proc.returncode != 0 and "nothing to commit" not in stdout.decode(errors="replace"):
+                    logger.warning("⚠️ Git command failed: %s - %s", ' '.join(cmd), stderr.decode(errors='replace'))
                     return False
             
-            print("✅ Data backed up to GitHub")
+            logger.info("✅ Data backed up to GitHub")
             return True
             
         except Exception as e:
-            print(f"❌ GitHub backup failed: {e}")
+            logger.error("❌ GitHub backup failed: %s", e)
             return False
     
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever the vehicle data changes"""
+        return self.storage.version
+    
     def get_processed_data_for_reminders(self) -> List[Tuple]:
         """Get processed vehicle data for daily reminders"""
-        active_vehicles = self.storage.get_active_vehicles()
-        tuples = []
-        
-        for plate, vehicle_data in active_vehicles.items():
-            for event in vehicle_data["events"]:
-                exp_date = None
-                if event["expires"]:
-                    try:
-                        exp_date = dt.datetime.fromisoformat(event["expires"]).date()
-                    except Exception:
-                        continue
-                
-                ts = None
-                if event["last_updated"]:
-                    try:
-                        ts = dt.datetime.fromisoformat(event["last_updated"])
-                    except Exception:
-                        pass
-                
-                tuples.append((plate, event["event_type"], exp_date, ts))
-        
-        return tuples
+        return self.storage.get_reminder_tuples()
     
     def get_vehicle_details(self, plate: str) -> Optional[dict]:
         """Get detailed information for a specific vehicle"""
-        vehicles = self.storage.get_all_vehicles()
-        return vehicles.get(plate.upper())
+        return self.storage.get_vehicle(plate.upper())
     
     def get_all_active_plates(self) -> List[str]:
         """Get list of all active (non-excluded) plate numbers"""
-        active_vehicles = self.storage.get_active_vehicles()
-        return sorted(active_vehicles.keys())
+        # Sorted once per data version
+        if self._active_plates_cache is None or self._active_plates_cache[0] != self.storage.version:
+            self._active_plates_cache = (self.storage.version, sorted(self.storage.get_active_vehicles()))
+        return self._active_plates_cache[1]
     
     def exclude_vehicle(self, plate: str, excluded_by: str) -> Tuple[bool, str]:
         """Exclude a vehicle from future reports"""
         plate = plate.upper()
-        vehicles = self.storage.get_all_vehicles()
+        vehicle = self.storage.get_vehicle(plate)
         
-        if plate not in vehicles:
+        if vehicle is None:
             return False, f"❌ Vehicle {plate} not found in data"
         
-        if vehicles[plate].get("excluded", False):
+        if vehicle.get("excluded", False):
             return False, f"⚠️ Vehicle {plate} is already excluded"
         
         success = self.storage.exclude_vehicle(plate, excluded_by)
@@ -161,21 +198,23 @@ class DataSync:
         if not excluded:
             return "📋 No vehicles are currently excluded"
         
-        lines = ["📋 Excluded vehicles:"]
-        for plate, vehicle_data in excluded.items():
-            excluded_at = vehicle_data.get("excluded_at", "")
-            excluded_by = vehicle_data.get("excluded_by", "unknown")
-            
-            if excluded_at:
-                try:
-                    date_str = dt.datetime.fromisoformat(excluded_at).strftime("%Y-%m-%d")
-                    lines.append(f"• {plate} (excluded {date_str} by {excluded_by})")
-                except Exception:
-                    lines.append(f"• {plate} (excluded by {excluded_by})")
-            else:
-                lines.append(f"• {plate} (excluded by {excluded_by})")
+        fromiso = dt.datetime.fromisoformat
         
-        return "\n".join(lines)
+        def rows():
+            yield "📋 Excluded vehicles:"
+            for plate, vehicle_data in excluded.items():
+                excluded_at = vehicle_data.get("excluded_at", "")
+                excluded_by = vehicle_data.get("excluded_by", "unknown")
+                
+                if excluded_at:
+                    try:
+                        yield f"• {plate} (excluded {fromiso(excluded_at).date().isoformat()} by {excluded_by})"
+                        continue
+                    except Exception:
+                        pass
+                yield f"• {plate} (excluded by {excluded_by})"
+        
+        return "\n".join(rows())
     
     def is_data_available(self) -> bool:
         """Check if we have usable data"""
@@ -189,14 +228,14 @@ class DataSync:
         if not last_updated:
             return "❌ No data available - run /update to sync from Google Sheets"
         
-        try:
-            update_time = dt.datetime.fromisoformat(last_updated)
-            age = dt.datetime.now() - update_time
-            age_str = f"{int(age.total_seconds() / 3600)}h {int((age.total_seconds() % 3600) / 60)}m ago"
-            
-            return f"📊 Data: {stats['active_vehicles']} active, {stats['excluded_vehicles']} excluded (updated {age_str})"
-        except Exception:
+        update_time = self.storage.get_last_updated_dt()
+        if update_time is None:
             return f"📊 Data: {stats['active_vehicles']} active, {stats['excluded_vehicles']} excluded"
+        
+        age = dt.datetime.now() - update_time
+        age_str = f"{int(age.total_seconds() / 3600)}h {int((age.total_seconds() % 3600) / 60)}m ago"
+        
+        return f"📊 Data: {stats['active_vehicles']} active, {stats['excluded_vehicles']} excluded (updated {age_str})"
 
 # Global instance
 data_sync = DataSync()
@@ -4,20 +4,31 @@ Replaces Google Sheets API caching with persistent local storage.
 """
 
 import json
+import logging
+import mmap
 import os
+import sys
 import datetime as dt
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any
 from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
 
-@dataclass
+try:
+    import orjson
+except ImportError:  # optional fast path, stdlib json is the fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
 class VehicleEvent:
     event_type: str
     expires: Optional[str]  # ISO date string
     doc_links: List[str]
     last_updated: str  # ISO timestamp
 
-@dataclass
+@dataclass(slots=True)
 class VehicleRecord:
     plate: str
     events: List[VehicleEvent]
@@ -29,38 +40,71 @@ class VehicleRecord:
 class JSONStorage:
     def __init__(self, file_path: str = "/opt/render/project/src/vehicle_data.json"):
         self.file_path = file_path
+        self._last_sync_fingerprint: Optional[int] = None  # hash of the last synced rows
+        self.version = 0  # bumped whenever vehicle data changes
+        self._last_updated_cache: Optional[tuple] = None  # (iso string, parsed datetime)
         self.data = self._load_data()
+        self._rebuild_indexes()
     
     def _load_data(self) -> Dict[str, Any]:
         """Load data from JSON file, create empty structure if not exists"""
         try:
             if os.path.exists(self.file_path):
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"📋 Loaded vehicle data from {self.file_path}")
-                    return data
+                data = self._read_file()
+                # The same few event types repeat for every vehicle; share one string each.
+                # Tolerate malformed events so one bad row can't discard the whole store.
+                for vehicle in data.get("vehicles", {}).values():
+                    for event in vehicle.get("events", []):
+                        event_type = event.get("event_type")
+                        if isinstance(event_type, str):
+                            event["event_type"] = sys.intern(event_type)
+                logger.info("📋 Loaded vehicle data from %s", self.file_path)
+                return data
         except Exception as e:
-            print(f"⚠️ Error loading JSON data: {e}")
+            logger.warning("⚠️ Error loading JSON data: %s", e)
         
         # Return empty structure
-        print(f"🆕 Creating new vehicle data structure")
+        logger.info("🆕 Creating new vehicle data structure")
         return {
             "last_updated": None,
             "vehicles": {}
         }
     
+    def _read_file(self) -> Dict[str, Any]:
+        """Parse the JSON file; orjson reads straight from an mmap without an extra bytes copy"""
+        with open(self.file_path, 'rb') as f:
+            if not orjson:
+                return json.loads(f.read())
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+    
+    def _rebuild_indexes(self) -> None:
+        """Rebuild the active/excluded plate sets from the loaded data"""
+        vehicles = self.data["vehicles"]
+        self._excluded_plates = {p for p, v in vehicles.items() if v.get("excluded", False)}
+        self._active_plates = set(vehicles) - self._excluded_plates
+        self._reminder_index: Optional[List[tuple]] = None
+    
     def _save_data(self) -> bool:
         """Save data to JSON file"""
         try:
+            if orjson:
+                payload = orjson.dumps(self.data, option=orjson.OPT_INDENT_2)
+            else:
+                payload = json.dumps(self.data, indent=2, ensure_ascii=False).encode('utf-8')
+            
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
             
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-            print(f"💾 Saved vehicle data to {self.file_path}")
+            # Write to a temp file and swap it in so a crash never leaves a partial file
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.file_path)
+            logger.info("💾 Saved vehicle data to %s", self.file_path)
             return True
         except Exception as e:
-            print(f"❌ Error saving JSON data: {e}")
+            logger.error("❌ Error saving JSON data: %s", e)
             return False
     
     def update_vehicle_data(self, vehicles_data: List[tuple]) -> bool:
@@ -79,30 +123,34 @@ class JSONStorage:
         Update vehicle data from Google Sheets sync with document links.
         vehicles_data: List of (plate, event_type, expiry_date, timestamp, doc_links) tuples
         """
-        from .data_model import latest_by_plate_event
+        from .data_model import DATE_MIN, TS_MIN
         
         now = dt.datetime.now().isoformat()
         
-        # First, collect all raw data
-        all_raw_events = []
-        for plate, event_type, expiry_date, timestamp, doc_links in vehicles_data:
-            all_raw_events.append((plate, event_type, expiry_date, timestamp, doc_links))
-        
-        # Use latest_by_plate_event logic to get only the most recent entries
-        # Convert to format expected by latest_by_plate_event
-        tuples_for_latest = [(plate, event_type, expiry_date, timestamp) for plate, event_type, expiry_date, timestamp, doc_links in all_raw_events]
-        latest_records = latest_by_plate_event(tuples_for_latest)
+        # The same sheet rows rebuild the same vehicles; skip the rebuild, version
+        # bump and file write, but still record that the data was synced just now
+        fingerprint = hash(tuple(
+            (plate, event_type, expiry_date, timestamp, tuple(doc_links))
+            for plate, event_type, expiry_date, timestamp, doc_links in vehicles_data
+        ))
+        if fingerprint == self._last_sync_fingerprint:
+            self.data["last_updated"] = now
+            self._last_updated_cache = None
+            return True
         
-        # Create a lookup for document links and timestamps using the original data
-        data_lookup = {}
-        for plate, event_type, expiry_date, timestamp, doc_links in all_raw_events:
-            key = (plate, event_type, expiry_date)
-            data_lookup[key] = (doc_links, timestamp)
+        # Single pass reducing (plate, event) to its winning row: greater expiry
+        # wins, ties go to the newer timestamp, same rule as latest_by_plate_event
+        latest: Dict[tuple, tuple] = {}
+        for plate, event_type, expiry_date, timestamp, doc_links in vehicles_data:
+            key = (plate, event_type)
+            rank = (expiry_date or DATE_MIN, timestamp or TS_MIN)
+            prev = latest.get(key)
+            if prev is None or rank > prev[0]:
+                latest[key] = (rank, expiry_date, doc_links, timestamp)
         
         # Build new vehicles data using only latest records
         new_vehicles = {}
-        for record in latest_records:
-            plate = record.plate
+        for (plate, event_type), (_, expiry_date, doc_links, timestamp) in latest.items():
             if plate not in new_vehicles:
                 new_vehicles[plate] = {
                     "events": [],
@@ -112,111 +160,177 @@ class JSONStorage:
                     "last_seen": now
                 }
             
-            # Find matching document links and timestamp
-            key = (record.plate, record.event_type, record.expiry_date)
-            doc_links, timestamp = data_lookup.get(key, ([], None))
-            
             # Add event
             event = {
-                "event_type": record.event_type,
-                "expires": record.expiry_date.isoformat() if record.expiry_date else None,
+                "event_type": event_type,
+                "expires": expiry_date.isoformat() if expiry_date else None,
                 "doc_links": doc_links,
                 "last_updated": timestamp.isoformat() if timestamp else now
             }
             new_vehicles[plate]["events"].append(event)
         
+        existing_vehicles = self.data["vehicles"]
+        
+        # Vehicles not seen in latest sync are dropped unless excluded; the
+        # active index already holds exactly the non-excluded plates
+        to_remove = self._active_plates.difference(new_vehicles)
+        
         # Merge with existing data, preserving exclusions
         for plate, vehicle_data in new_vehicles.items():
-            if plate in self.data["vehicles"]:
+            existing = existing_vehicles.get(plate)
+            if existing is not None:
                 # Preserve exclusion status
-                existing = self.data["vehicles"][plate]
                 vehicle_data["excluded"] = existing.get("excluded", False)
                 vehicle_data["excluded_at"] = existing.get("excluded_at")
                 vehicle_data["excluded_by"] = existing.get("excluded_by")
             
-            self.data["vehicles"][plate] = vehicle_data
-        
-        # Remove vehicles not seen in latest sync (unless excluded)
-        current_plates = set(new_vehicles.keys())
-        to_remove = []
-        for plate in self.data["vehicles"]:
-            if plate not in current_plates and not self.data["vehicles"][plate].get("excluded", False):
-                to_remove.append(plate)
+            existing_vehicles[plate] = vehicle_data
         
         for plate in to_remove:
-            del self.data["vehicles"][plate]
-            print(f"🗑️ Removed outdated vehicle: {plate}")
+            del existing_vehicles[plate]
+            logger.info("🗑️ Removed outdated vehicle: %s", plate)
         
+        # Exclusions are carried over unchanged, every other synced plate is active
+        self._active_plates = set(new_vehicles) - self._excluded_plates
+        self._reminder_index = None
+        self.version += 1
         self.data["last_updated"] = now
-        return self._save_data()
+        if not self._save_data():
+            return False
+        self._last_sync_fingerprint = fingerprint
+        return True
     
     def get_active_vehicles(self) -> Dict[str, Dict]:
         """Get all non-excluded vehicles"""
-        active = {}
-        for plate, vehicle in self.data["vehicles"].items():
-            if not vehicle.get("excluded", False):
-                active[plate] = vehicle
-        return active
+        # Walk the vehicles dict rather than the set so the order is the stable insertion order
+        active = self._active_plates
+        return {plate: v for plate, v in self.data["vehicles"].items() if plate in active}
     
-    def get_all_vehicles(self) -> Dict[str, Dict]:
-        """Get all vehicles including excluded ones"""
-        return self.data["vehicles"].copy()
+    def get_reminder_tuples(self) -> List[tuple]:
+        """
+        Get (plate, event_type, expiry_date, timestamp) tuples for active vehicles
+        that can trigger a reminder. Built once and reused until the data changes.
+        """
+        if self._reminder_index is None:
+            self._reminder_index = self._build_reminder_index()
+        return self._reminder_index
+    
+    def _build_reminder_index(self) -> List[tuple]:
+        from .data_model import parse_iso_date
+        
+        vehicles = self.data["vehicles"]
+        fromiso = dt.datetime.fromisoformat
+        index = []
+        append = index.append
+        
+        for plate in self._active_plates:
+            for event in vehicles[plate]["events"]:
+                # Registration certificates and undated events never produce reminders
+                if event["event_type"] == "registration_certificate":
+                    continue
+                expires = event["expires"]
+                if not expires:
+                    continue
+                exp_date = parse_iso_date(expires)
+                if exp_date is None:
+                    continue
+                
+                ts = None
+                last_updated = event["last_updated"]
+                if last_updated:
+                    try:
+                        ts = fromiso(last_updated)
+                    except Exception:
+                        pass
+                
+                append((plate, event["event_type"], exp_date, ts))
+        
+        return index
+    
+    def get_all_vehicles(self) -> Mapping[str, Dict]:
+        """Get a read-only view of all vehicles including excluded ones"""
+        return MappingProxyType(self.data["vehicles"])
+    
+    def get_vehicle(self, plate: str) -> Optional[Dict]:
+        """Get a single vehicle by plate, or None if unknown"""
+        return self.data["vehicles"].get(plate)
     
     def exclude_vehicle(self, plate: str, excluded_by: str) -> bool:
         """Mark a vehicle as excluded"""
-        if plate not in self.data["vehicles"]:
+        vehicle = self.data["vehicles"].get(plate)
+        if vehicle is None:
             return False
         
-        self.data["vehicles"][plate]["excluded"] = True
-        self.data["vehicles"][plate]["excluded_at"] = dt.datetime.now().isoformat()
-        self.data["vehicles"][plate]["excluded_by"] = excluded_by
+        vehicle["excluded"] = True
+        vehicle["excluded_at"] = dt.datetime.now().isoformat()
+        vehicle["excluded_by"] = excluded_by
+        self._active_plates.discard(plate)
+        self._excluded_plates.add(plate)
+        self._reminder_index = None
+        self.version += 1
         
         return self._save_data()
     
     def restore_vehicle(self, plate: str) -> bool:
         """Restore an excluded vehicle"""
-        if plate not in self.data["vehicles"]:
+        vehicle = self.data["vehicles"].get(plate)
+        if vehicle is None:
             return False
         
-        self.data["vehicles"][plate]["excluded"] = False
-        self.data["vehicles"][plate]["excluded_at"] = None
-        self.data["vehicles"][plate]["excluded_by"] = None
+        vehicle["excluded"] = False
+        vehicle["excluded_at"] = None
+        vehicle["excluded_by"] = None
+        # The plate may have left the sheet while excluded; let the next sync drop it
+        self._last_sync_fingerprint = None
+        self._excluded_plates.discard(plate)
+        self._active_plates.add(plate)
+        self._reminder_index = None
+        self.version += 1
         
         return self._save_data()
     
     def get_excluded_vehicles(self) -> Dict[str, Dict]:
         """Get all excluded vehicles"""
-        excluded = {}
-        for plate, vehicle in self.data["vehicles"].items():
-            if vehicle.get("excluded", False):
-                excluded[plate] = vehicle
-        return excluded
+        excluded = self._excluded_plates
+        return {plate: v for plate, v in self.data["vehicles"].items() if plate in excluded}
     
     def get_last_updated(self) -> Optional[str]:
         """Get last update timestamp"""
         return self.data.get("last_updated")
     
-    def is_data_fresh(self, max_age_hours: int = 25) -> bool:
-        """Check if data is fresh enough"""
+    def get_last_updated_dt(self) -> Optional[dt.datetime]:
+        """Get last update timestamp as a datetime, parsed once per update"""
         last_updated = self.get_last_updated()
         if not last_updated:
-            return False
+            return None
+        
+        cached = self._last_updated_cache
+        if cached and cached[0] == last_updated:
+            return cached[1]
         
         try:
-            last_update_time = dt.datetime.fromisoformat(last_updated)
-            age = dt.datetime.now() - last_update_time
-            return age.total_seconds() < (max_age_hours * 3600)
+            parsed = dt.datetime.fromisoformat(last_updated)
         except Exception:
+            return None
+        self._last_updated_cache = (last_updated, parsed)
+        return parsed
+    
+    def is_data_fresh(self, max_age_hours: int = 25) -> bool:
+        """Check if data is fresh enough"""
+        last_update_time = self.get_last_updated_dt()
+        if last_update_time is None:
             return False
+        
+        age = dt.datetime.now() - last_update_time
+        return age.total_seconds() < (max_age_hours * 3600)
     
     def get_stats(self) -> Dict[str, int]:
         """Get storage statistics"""
-        total = len(self.data["vehicles"])
-        excluded = len(self.get_excluded_vehicles())
-        active = total - excluded
+        active = len(self._active_plates)
+        excluded = len(self._excluded_plates)
         
         return {
-            "total_vehicles": total,
+            "total_vehicles": active + excluded,
             "active_vehicles": active,
             "excluded_vehicles": excluded
         }
@@ -4,777 +4,912 @@ Replaces Google Sheets API caching with persistent local data.
 """
 
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters
-import re
-import sys
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.request import HTTPXRequest
+from telegram.ext import AIORateLimiter, Application, CommandHandler, ContextTypes, CallbackQueryHandler
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
 import time
 import asyncio
 import datetime as dt
-from datetime import timezone, timedelta
+import functools
+from zoneinfo import ZoneInfo
+
+# Load .env before any module reads the (cached) config
+load_dotenv()
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue so the event loop never blocks on stdout.
+    The returned listener writes the records from a background thread.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Records are fully formatted by the stream handler on the listener side
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    # httpx logs every getUpdates poll at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+# Configured before the package imports below, which already log while loading cached data
+_log_listener = setup_logging()
 
 from .config import load_config
-from .data_model import latest_by_plate_event, compute_windows, format_summary_lt
+from .data_model import EMPTY_SUMMARY_LT, latest_by_plate_event, compute_windows, format_summary_lt, parse_iso_date
 from .users_repo import UsersRepo
-from .sheets_client import SheetsClient
+from .sheets_client import get_sheets_client, run_sheets_call
 from .data_sync import data_sync
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
 cfg = load_config()
 
-# User approval cache (still needed for Users sheet)
-_users_cache = {
-    'approved_users': set(),
-    'timestamp': 0,
-    'ttl': 300  # 5 minutes cache
-}
+VILNIUS_TZ = ZoneInfo("Europe/Vilnius")
 
-def get_cached_approved_users():
-    """Get approved user IDs with caching to reduce Users sheet API calls"""
-    now = time.time()
-    if _users_cache['approved_users'] and (now - _users_cache['timestamp']) < _users_cache['ttl']:
-        print(f"👥 Using cached user approvals (age: {int(now - _users_cache['timestamp'])}s)")
-        return _users_cache['approved_users']
+# Whether the Users sheet can be used at all; fixed for the life of the process
+SHEETS_CONFIGURED = bool(cfg.spreadsheet_id and cfg.google_credentials_path)
+
+# Max number of reminder messages in flight at once
+SEND_CONCURRENCY = 25
+
+# Reply texts
+HELP_TEXT = """
+Galimos komandos:
+/start - Registracija
+/pagalba - Šis pranešimas
+/info - Šiandienos priminimas
+/sarasas - Visų numerių sąrašas
+/id <numeris> - Konkretaus numerio duomenys
+
+Administratoriaus komandos:
+/dryrun - Peržiūrėti šiandienos pranešimą
+/pending - Patvirtinti laukiančius vartotojus
+/approve <user_id> - Patvirtinti vartotoją
+/users - Vartotojų sąrašas
+/update - Atnaujinti duomenis iš Google Sheets
+/remove <numeris> - Pašalinti numerį iš pranešimų
+/sendtoday - Išsiųsti šiandienos pranešimą
+/whoami - Sužinoti savo ID
+"""
+
+WELCOME_TEXT = """🎉 Sveikiname! Jūsų prieiga patvirtinta.
+
+Galimos komandos:
+/info - Šiandienos priminimas
+/sarasas - Visų numerių sąrašas  
+/id <numeris> - Konkretaus numerio duomenys
+
+Botas automatiškai siųs priminimus kiekvieną dieną 8:00 val."""
+
+NO_PERMISSION_TEXT = "Neturite teisės naudoti šios komandos."
+NOT_APPROVED_TEXT = "Jūsų prieiga dar nepatvirtinta."
+NO_SHEETS_CONFIG_TEXT = "Trūksta Sheets konfigūracijos."
+NO_DATA_ADMIN_TEXT = "❌ Duomenų nėra. Naudokite /update."
+START_FALLBACK_TEXT = "Sveiki! Botas veikia. (/start)"
+
+# Shared Users sheet repo, created on first use; the lock stops two pool threads from both creating it
+_users_repo: UsersRepo | None = None
+_users_repo_lock = threading.Lock()
+
+def get_users_repo() -> UsersRepo:
+    """Get the shared UsersRepo so commands don't re-authenticate and reopen the spreadsheet"""
+    global _users_repo
+    if _users_repo is None:
+        with _users_repo_lock:
+            if _users_repo is None:
+                client = get_sheets_client(cfg.spreadsheet_id, cfg.google_credentials_path)
+                _users_repo = UsersRepo(client, cfg.users_tab_name)
+    return _users_repo
+
+class TTLCache:
+    """A single cached value that goes stale after ttl seconds"""
+    __slots__ = ("value", "stamp", "ttl")
+    
+    def __init__(self, ttl: float):
+        self.value = None
+        self.stamp = 0.0
+        self.ttl = ttl
     
-    print("🔄 Fetching fresh user approvals from Google Sheets...")
-    if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-        return set()
+    def get(self, now: float):
+        """Return the value if it is still fresh at now, else None"""
+        if self.value is not None and now - self.stamp < self.ttl:
+            return self.value
+        return None
     
+    def set(self, value, now: float) -> None:
+        self.value = value
+        self.stamp = now
+    
+    def invalidate(self) -> None:
+        self.value = None
+        self.stamp = 0.0
+
+# Approved user IDs from the Users sheet; the TTL is a safety net, writes made by the bot invalidate immediately
+_approved_users_cache = TTLCache(ttl=3600)
+# Every Users sheet row, for the admin /pending and /users listings
+_all_users_cache = TTLCache(ttl=60)
+
+# Approved IDs are also kept on disk next to the vehicle data so a restart doesn't need a Sheets read
+USERS_CACHE_PATH = os.path.join(os.path.dirname(data_sync.storage.file_path), "users_cache.json")
+
+def _save_approved_users_file(approved_ids: frozenset, generation: int) -> None:
+    """Write the approval snapshot of generation to disk, unless an invalidation has happened since"""
+    # Per-thread temp file: the slow write happens outside _users_cache_lock, and concurrent saves don't share it
+    tmp_path = f"{USERS_CACHE_PATH}.{threading.get_ident()}.tmp"
     try:
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        approved = repo.list_approved()
-        approved_ids = {user.telegram_user_id for user in approved}
-        
-        # Cache the result
-        _users_cache['approved_users'] = approved_ids
-        _users_cache['timestamp'] = now
-        print(f"✅ Cached {len(approved_ids)} approved users")
+        os.makedirs(os.path.dirname(USERS_CACHE_PATH), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump({"ts": time.time(), "ids": sorted(approved_ids)}, f)
+        with _users_cache_lock:
+            if generation == _users_cache_generation:
+                os.replace(tmp_path, USERS_CACHE_PATH)
+                return
+        os.remove(tmp_path)
+    except Exception as e:
+        logger.warning("⚠️ Could not save user approvals cache: %s", e)
+
+def _load_approved_users_file() -> None:
+    """Seed the approval cache from disk if the saved copy is still within its TTL"""
+    try:
+        with open(USERS_CACHE_PATH) as f:
+            saved = json.load(f)
+        age = time.time() - saved["ts"]
+        if 0 <= age < _approved_users_cache.ttl:
+            _approved_users_cache.set(frozenset(saved["ids"]), time.monotonic() - age)
+            logger.info("👥 Loaded %s cached user approvals from disk", len(saved["ids"]))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("⚠️ Could not load user approvals cache: %s", e)
+
+_load_approved_users_file()
+
+# Bumped by every invalidation; a Users sheet read started before the bump must not be cached.
+# The lock keeps that check-and-store atomic against invalidations from other threads.
+_users_cache_generation = 0
+_users_cache_lock = threading.Lock()
+
+def invalidate_users_cache():
+    """Force the next approval check and user listing to re-read the Users sheet"""
+    global _users_cache_generation
+    with _users_cache_lock:
+        _users_cache_generation += 1
+        _approved_users_cache.invalidate()
+        _all_users_cache.invalidate()
+        try:
+            os.remove(USERS_CACHE_PATH)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("⚠️ Could not remove user approvals cache: %s", e)
+
+def _store_all_users(all_users, generation: int) -> tuple[tuple, frozenset]:
+    """
+    Cache a full Users sheet read, refreshing the approval cache from it too.
+    generation is _users_cache_generation from before the read; stale reads are returned but not cached.
+    Returns (all users, approved IDs).
+    """
+    all_users = tuple(all_users)
+    approved_ids = frozenset(u.telegram_user_id for u in all_users if u.status == "approved")
+    with _users_cache_lock:
+        if generation != _users_cache_generation:
+            return all_users, approved_ids
+        now = time.monotonic()
+        _all_users_cache.set(all_users, now)
+        _approved_users_cache.set(approved_ids, now)
+    _save_approved_users_file(approved_ids, generation)
+    return all_users, approved_ids
+
+def get_all_users() -> tuple:
+    """Get every Users sheet row, reading the sheet at most once per cache TTL"""
+    cached = _all_users_cache.get(time.monotonic())
+    if cached is not None:
+        return cached
+    return _read_all_users()[0]
+
+def _read_all_users() -> tuple[tuple, frozenset]:
+    """Read the Users sheet (blocking) and cache it; returns (all users, approved IDs)"""
+    generation = _users_cache_generation
+    return _store_all_users(get_users_repo().list_all(), generation)
+
+def _refresh_approved_users() -> frozenset:
+    """Fetch approved user IDs from the Users sheet (blocking) and cache them"""
+    logger.info("🔄 Fetching fresh user approvals from Google Sheets...")
+    if not SHEETS_CONFIGURED:
+        return frozenset()
+    
+    try:
+        # One full read also warms the /pending and /users listing cache
+        _, approved_ids = _read_all_users()
+        logger.info("✅ Cached %s approved users", len(approved_ids))
         return approved_ids
         
     except Exception as e:
-        print(f"❌ Error fetching user approvals: {e}")
+        logger.error("❌ Error fetching user approvals: %s", e)
         # Return cached data if available, even if expired
-        if _users_cache['approved_users']:
-            print("⚠️ Using expired user cache due to API error")
-            return _users_cache['approved_users']
-        return set()
+        if _approved_users_cache.value is not None:
+            logger.warning("⚠️ Using expired user cache due to API error")
+            return _approved_users_cache.value
+        return frozenset()
+
+# In-flight approval refresh shared by every caller that finds the cache expired
+_users_refresh_task: asyncio.Task | None = None
+
+async def get_cached_approved_users() -> frozenset:
+    """Get approved user IDs with caching to reduce Users sheet API calls"""
+    cached = _approved_users_cache.get(time.monotonic())
+    if cached is not None:
+        return cached
+    
+    # Shield so a cancelled handler doesn't cancel the refresh for everyone else
+    return await asyncio.shield(_start_users_refresh())
+
+_users_refresh_generation = -1
+
+def _start_users_refresh() -> asyncio.Task:
+    """Start an approval refresh, or return the one already in flight"""
+    global _users_refresh_task, _users_refresh_generation
+    # A refresh started before the last invalidation may return pre-write approvals; don't join it
+    if (
+        _users_refresh_task is None
+        or _users_refresh_task.done()
+        or _users_refresh_generation != _users_cache_generation
+    ):
+        _users_refresh_generation = _users_cache_generation
+        # Sheets calls are blocking; keep them off the event loop
+        _users_refresh_task = asyncio.create_task(run_sheets_call(_refresh_approved_users))
+    return _users_refresh_task
+
+# Refresh approvals in the background well inside the TTL, so handlers practically never wait on Sheets
+USERS_REFRESH_INTERVAL = _approved_users_cache.ttl / 2
+
+def _first_users_refresh_delay() -> float:
+    """Seconds until the first background refresh; an approval set loaded from disk is used until it is due"""
+    if _approved_users_cache.value is None:
+        return 0
+    age = time.monotonic() - _approved_users_cache.stamp
+    return max(0.0, USERS_REFRESH_INTERVAL - age)
+
+async def users_refresh_job(context: ContextTypes.DEFAULT_TYPE):
+    """Repeating job that keeps the approval cache warm"""
+    if SHEETS_CONFIGURED:
+        await _start_users_refresh()
+
+# Today's summary keyed by (data version, date); holds a single entry
+_today_summary_cache: dict[tuple[int, dt.date], tuple[list, list, str]] = {}
+
+def get_today_summary() -> tuple[list, list, str]:
+    """Get (upcoming, expired, text) for today, recomputed only when the data or date changes"""
+    today = dt.date.today()
+    key = (data_sync.version, today)
+    cached = _today_summary_cache.get(key)
+    if cached is None:
+        latest = latest_by_plate_event(data_sync.get_processed_data_for_reminders())
+        upcoming, expired = compute_windows(today, latest)
+        cached = (upcoming, expired, format_summary_lt(upcoming, expired))
+        _today_summary_cache.clear()
+        _today_summary_cache[key] = cached
+    return cached
+
+# All plate parameters, in display order, with their "- label: " line prefix
+PLATE_DETAIL_FIELDS = tuple(
+    (event_type, label, f"- {label}: ")
+    for event_type, label in (
+        ("lv_road_toll", "LV kelių mokestis"),
+        ("lt_road_toll", "LT kelių mokestis"),
+        ("inspection", "Techninė apžiūra"),
+        ("insurance", "Draudimas"),
+        ("registration_certificate", "Registracijos liudijimas"),
+    )
+)
+
+def _format_plate_details(plate: str, vehicle_data: dict, today: dt.date) -> str:
+    """Format every parameter of a vehicle for /id and plate buttons"""
+    lines = [plate + ":"]
+    append = lines.append
+    
+    # Create lookup for existing events
+    events_lookup = {event["event_type"]: event for event in vehicle_data["events"]}
+    
+    # Display all parameters in consistent order
+    for event_type, label, prefix in PLATE_DETAIL_FIELDS:
+        event = events_lookup.get(event_type)
+        if event_type == "registration_certificate":
+            # Special handling for registration certificate - show document links
+            doc_links = event.get("doc_links", []) if event else []
+            if doc_links:
+                append(prefix.rstrip())
+                for i, link in enumerate(doc_links, 1):
+                    append(f"  Dokumentas {i}: {link}")
+            else:
+                append(prefix + "(dokumentų nėra)")
+            continue
+        
+        # Regular event with expiry date
+        expires = event.get("expires") if event else None
+        if not expires:
+            append(prefix + "(duomenų nėra)")
+            continue
+        exp_date = parse_iso_date(expires)
+        if exp_date is None:
+            append(prefix + "(data neteisinga)")
+        elif exp_date < today:
+            append(prefix + "nebegalioja")
+        else:
+            append(prefix + "galioja iki " + exp_date.isoformat())
+    
+    return "\n".join(lines)
+
+# Formatted plate details for the current (data version, date), keyed by plate
+_plate_details_cache: dict[str, str] = {}
+_plate_details_key: tuple[int, dt.date] | None = None
+
+def get_plate_details(plate: str) -> str | None:
+    """Get the /id text for an active plate, or None if it is unknown or excluded"""
+    global _plate_details_key
+    key = (data_sync.version, dt.date.today())
+    if key != _plate_details_key:
+        _plate_details_cache.clear()
+        _plate_details_key = key
+    
+    text = _plate_details_cache.get(plate)
+    if text is None:
+        vehicle_data = data_sync.get_vehicle_details(plate)
+        if not vehicle_data or vehicle_data.get("excluded", False):
+            return None
+        text = _plate_details_cache[plate] = _format_plate_details(plate, vehicle_data, key[1])
+    return text
+
+# (data version, reply text, keyboard) for /sarasas; rebuilt only after the data changes
+_plate_list_cache: tuple[int, str, InlineKeyboardMarkup] | None = None
+
+def get_plate_list_reply() -> tuple[str, InlineKeyboardMarkup] | None:
+    """Get the /sarasas text and plate keyboard, or None if there are no active plates"""
+    global _plate_list_cache
+    version = data_sync.version
+    if _plate_list_cache is None or _plate_list_cache[0] != version:
+        plates = data_sync.get_all_active_plates()
+        if not plates:
+            return None
+        buttons = [[InlineKeyboardButton(plate, callback_data=f"plate:{plate}")] for plate in plates]
+        _plate_list_cache = (version, "Numerių sąrašas:\n" + "\n".join(plates), InlineKeyboardMarkup(buttons))
+    return _plate_list_cache[1], _plate_list_cache[2]
+
+async def broadcast(bot: Bot, recipients: dict[int, str], text: str) -> int:
+    """
+    Send text to every chat_id -> name recipient concurrently.
+    Returns the number of messages delivered.
+    """
+    # Keep in-flight sends within the HTTP pool; pacing is left to the rate limiter
+    sem = asyncio.Semaphore(SEND_CONCURRENCY)
+    # Same text for everyone; bind it once instead of per recipient
+    send = functools.partial(bot.send_message, text=text)
+    
+    async def _send(chat_id, name) -> bool:
+        async with sem:
+            # Flood control (RetryAfter) is throttled and retried by the bot's rate limiter
+            try:
+                await send(chat_id=chat_id)
+                logger.debug("📨 Reminder sent to %s", name)
+                return True
+            except Exception as e:
+                logger.error("❌ Error sending reminder to %s: %s", chat_id, e)
+                return False
+    
+    results = await asyncio.gather(*(_send(chat_id, name) for chat_id, name in recipients.items()))
+    return sum(results)
 
-async def send_daily_reminders():
+async def send_daily_reminders(bot: Bot):
     """Send daily vehicle reminders using local JSON data"""
-    print("🕐 Starting daily reminder sending...")
+    logger.info("🕐 Starting daily reminder sending...")
     
     try:
         # First, sync data from Google Sheets
         success, message = await data_sync.sync_from_google_sheets()
         if not success:
-            print(f"⚠️ Sync failed: {message}")
+            logger.warning("⚠️ Sync failed: %s", message)
             # Continue with existing data if available
             if not data_sync.is_data_available():
-                print("❌ No data available, skipping reminders")
+                logger.error("❌ No data available, skipping reminders")
                 return
         
         # Get processed data from JSON storage
         tuples = data_sync.get_processed_data_for_reminders()
         if not tuples:
-            print("📭 No vehicle data for reminders")
+            logger.info("📭 No vehicle data for reminders")
             return
         
         # Process deadlines
-        latest = latest_by_plate_event(tuples)
-        today = dt.date.today()
-        upcoming, expired = compute_windows(today, latest)
-        text = format_summary_lt(upcoming, expired)
+        upcoming, expired, text = get_today_summary()
         
-        if not text.strip() or "Šiandien priminimų nėra" in text:
-            print("📭 No reminders to send today")
+        if text is EMPTY_SUMMARY_LT:
+            logger.info("📭 No reminders to send today")
             return
         
         # Get approved users + admins
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            print("⚠️ Users sheet configuration missing")
+        if not SHEETS_CONFIGURED:
+            logger.warning("⚠️ Users sheet configuration missing")
             return
             
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        approved = repo.list_approved()
-        all_users = repo.list_all()
+        # One Users sheet read covers both approved users and admins, and refreshes
+        # the approval and listing caches; the cache file is written off the event loop too
+        all_users, _ = await run_sheets_call(_read_all_users)
         
         # Collect recipients: approved users + admins
-        recipients = set()  # Use set to avoid duplicates
+        recipients = {}  # chat_id -> name, so each chat gets one message
         
-        # Add approved users
-        for user in approved:
-            if user.telegram_chat_id:
-                recipients.add((user.telegram_chat_id, user.telegram_username or str(user.telegram_user_id)))
-        
-        # Add admins (if they exist in Users sheet)
         for user in all_users:
-            if user.telegram_user_id in cfg.admin_user_ids and user.telegram_chat_id:
-                recipients.add((user.telegram_chat_id, f"Admin: {user.telegram_username or str(user.telegram_user_id)}"))
+            chat_id = user.telegram_chat_id
+            if not chat_id:
+                continue
+            name = user.telegram_username or str(user.telegram_user_id)
+            if user.telegram_user_id in cfg.admin_user_ids:
+                # Admins (if they exist in Users sheet); the admin label wins over a plain entry
+                recipients[chat_id] = f"Admin: {name}"
+            elif user.status == "approved":
+                recipients.setdefault(chat_id, name)
         
         if not recipients:
-            print("📭 No users or admins to send reminders to")
+            logger.info("📭 No users or admins to send reminders to")
             return
         
-        # Get bot instance for sending messages
-        from telegram import Bot
-        bot = Bot(token=cfg.telegram_bot_token)
+        sent_count = await broadcast(bot, recipients, text)
+        error_count = len(recipients) - sent_count
         
-        sent_count = 0
-        error_count = 0
-        
-        for chat_id, name in recipients:
-            try:
-                await bot.send_message(chat_id=chat_id, text=text)
-                sent_count += 1
-                print(f"📨 Daily reminder sent to {name}")
-                
-                # Small delay to avoid rate limits
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                error_count += 1
-                print(f"❌ Error sending reminder to {chat_id}: {e}")
-        
-        print(f"✅ Daily reminder sending completed: {sent_count} sent, {error_count} errors")
+        logger.info("✅ Daily reminder sending completed: %s sent, %s errors", sent_count, error_count)
         
     except Exception as e:
-        print(f"❌ Error in daily reminder sending: {e}")
+        logger.error("❌ Error in daily reminder sending: %s", e)
 
 async def daily_job(context: ContextTypes.DEFAULT_TYPE):
     """Daily job function for telegram job queue"""
-    await send_daily_reminders()
+    await send_daily_reminders(context.bot)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat = update.effective_chat
     # Try to upsert user as pending in Users sheet
     try:
-        if cfg.spreadsheet_id and cfg.google_credentials_path:
-            client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-            repo = UsersRepo(client, cfg.users_tab_name)
-            repo.upsert_pending(user.id, user.username, chat.id)
+        if SHEETS_CONFIGURED:
+            repo = await run_sheets_call(get_users_repo)
+            await run_sheets_call(repo.upsert_pending, user.id, user.username, chat.id)
+            # A new pending row should show up in /pending right away
+            _all_users_cache.invalidate()
             await update.message.reply_text('Sveiki! Jūsų registracija pateikta. Laukite administratoriaus patvirtinimo.')
         else:
-            await update.message.reply_text('Sveiki! Botas veikia. (/start)')
+            await update.message.reply_text(START_FALLBACK_TEXT)
     except Exception as e:
-        print(f"Error in start: {e}")
-        await update.message.reply_text('Sveiki! Botas veikia. (/start)')
-
-def main():
-    print("🤖 Initializing Telegram bot...", flush=True)
+        logger.error("Error in start: %s", e)
+        await update.message.reply_text(START_FALLBACK_TEXT)
+
+# Error handler
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if "Conflict" in str(context.error):
+        logger.warning("⚠️ Conflict detected - another bot instance may be running")
+    else:
+        logger.error("Update handling failed: %s", context.error)
+
+# Helper functions
+def is_admin(update: Update) -> bool:
+    u = update.effective_user
+    if not u:
+        return False
+    if u.id in cfg.admin_user_ids:
+        return True
+    # Telegram usernames never carry '@'; the configured names are stored lowercased
+    uname = u.username
+    return bool(uname) and uname.lower() in cfg.admin_usernames
+
+async def is_approved_user(update: Update) -> bool:
+    # Admins always pass
+    if is_admin(update):
+        return True
+    # If Users sheet not configured, allow by default
+    if not SHEETS_CONFIGURED:
+        return True
+    u = update.effective_user
+    if not u:
+        return False
+    approved_users = await get_cached_approved_users()
+    return u.id in approved_users
+
+# Help command
+async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(HELP_TEXT)
+
+# Admin dry-run command
+async def dryrun(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
     
-    # Add startup delay to avoid conflicts
-    time.sleep(3)
+    if not data_sync.is_data_available():
+        await update.message.reply_text(NO_DATA_ADMIN_TEXT)
+        return
     
-    app = Application.builder().token(cfg.telegram_bot_token).build()
+    _, _, text = get_today_summary()
+    await update.message.reply_text(text)
+
+# User info command
+async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_approved_user(update):
+        await update.message.reply_text(NOT_APPROVED_TEXT)
+        return
     
-    # Error handler
-    async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-        if "Conflict" in str(context.error):
-            print(f"⚠️ Conflict detected - another bot instance may be running", flush=True)
-        else:
-            print(f"ERROR: {context.error}", flush=True)
+    if not data_sync.is_data_available():
+        await update.message.reply_text("❌ Duomenų nėra. Susisiekite su administratoriumi.")
+        return
     
-    app.add_error_handler(error_handler)
+    _, _, text = get_today_summary()
+    await update.message.reply_text(text)
+
+# List all plates
+async def sarasas(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_approved_user(update):
+        await update.message.reply_text(NOT_APPROVED_TEXT)
+        return
     
-    # Add start handler
-    app.add_handler(CommandHandler('start', start))
-    
-    # Helper functions
-    def is_admin(update: Update) -> bool:
-        u = update.effective_user
-        if not u:
-            return False
-        if u.id in cfg.admin_user_ids:
-            return True
-        uname = (u.username or '').lstrip('@').lower()
-        return uname in cfg.admin_usernames
-
-    async def is_approved_user(update: Update) -> bool:
-        # Admins always pass
-        if is_admin(update):
-            return True
-        # If Users sheet not configured, allow by default
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            return True
-        u = update.effective_user
-        if not u:
-            return False
-        approved_users = get_cached_approved_users()
-        return u.id in approved_users
-    
-    # Help command
-    async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        help_text = """
-Galimos komandos:
-/start - Registracija
-/pagalba - Šis pranešimas
-/info - Šiandienos priminimas
-/sarasas - Visų numerių sąrašas
-/id <numeris> - Konkretaus numerio duomenys
-
-Administratoriaus komandos:
-/dryrun - Peržiūrėti šiandienos pranešimą
-/pending - Patvirtinti laukiančius vartotojus
-/approve <user_id> - Patvirtinti vartotoją
-/users - Vartotojų sąrašas
-/update - Atnaujinti duomenis iš Google Sheets
-/remove <numeris> - Pašalinti numerį iš pranešimų
-/sendtoday - Išsiųsti šiandienos pranešimą
-/whoami - Sužinoti savo ID
-        """
-        await update.message.reply_text(help_text)
-
-    app.add_handler(CommandHandler('pagalba', help_cmd))
+    cached = get_plate_list_reply()
+    if cached is None:
+        await update.message.reply_text("Sąrašas tuščias.")
+        return
     
-    # Admin dry-run command
-    async def dryrun(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        if not data_sync.is_data_available():
-            await update.message.reply_text("❌ Duomenų nėra. Naudokite /update.")
-            return
-        
-        tuples = data_sync.get_processed_data_for_reminders()
-        latest = latest_by_plate_event(tuples)
-        today = dt.date.today()
-        upcoming, expired = compute_windows(today, latest)
-        text = format_summary_lt(upcoming, expired)
-        await update.message.reply_text(text)
-
-    app.add_handler(CommandHandler('dryrun', dryrun))
-
-    # User info command
-    async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not await is_approved_user(update):
-            await update.message.reply_text("Jūsų prieiga dar nepatvirtinta.")
-            return
-        
-        if not data_sync.is_data_available():
-            await update.message.reply_text("❌ Duomenų nėra. Susisiekite su administratoriumi.")
-            return
-        
-        tuples = data_sync.get_processed_data_for_reminders()
-        latest = latest_by_plate_event(tuples)
-        today = dt.date.today()
-        upcoming, expired = compute_windows(today, latest)
-        text = format_summary_lt(upcoming, expired)
-        await update.message.reply_text(text)
-
-    app.add_handler(CommandHandler('info', info_cmd))
+    text, markup = cached
+    await update.message.reply_text(text, reply_markup=markup)
+
+# Get specific plate details
+async def cmd_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_approved_user(update):
+        await update.message.reply_text(NOT_APPROVED_TEXT)
+        return
+    
+    args = context.args or []
+    if not args:
+        await update.message.reply_text("Naudojimas: /id <numeris>")
+        return
+    
+    details = get_plate_details(args[0].strip().upper())
+    if details is None:
+        await update.message.reply_text("Numeris nerastas.")
+        return
+    
+    await update.message.reply_text(details)
 
-    # List all plates
-    async def sarasas(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not await is_approved_user(update):
-            await update.message.reply_text("Jūsų prieiga dar nepatvirtinta.")
-            return
-        
-        plates = data_sync.get_all_active_plates()
-        if not plates:
-            await update.message.reply_text("Sąrašas tuščias.")
-            return
-        
-        buttons = []
-        for plate in plates:
-            buttons.append([InlineKeyboardButton(plate, callback_data=f"plate:{plate}")])
-        
-        await update.message.reply_text(
-            "Numerių sąrašas:\n" + "\n".join(plates),
-            reply_markup=InlineKeyboardMarkup(buttons)
-        )
+# Admin update command
+async def update_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    await update.message.reply_text("🔄 Atnaujinami duomenys...")
+    success, message = await data_sync.sync_from_google_sheets(force=True)
+    await update.message.reply_text(message)
+
+# Admin remove command
+async def remove_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    args = context.args or []
+    if not args:
+        await update.message.reply_text("Naudojimas: /remove <numeris>")
+        return
+    
+    plate = args[0].strip().upper()
+    admin_name = update.effective_user.username or str(update.effective_user.id)
+    
+    success, message = data_sync.exclude_vehicle(plate, admin_name)
+    await update.message.reply_text(message)
+    
+    if success:
+        # Show updated exclusion list
+        excluded_list = data_sync.get_excluded_vehicles_list()
+        await update.message.reply_text(excluded_list)
 
-    app.add_handler(CommandHandler('sarasas', sarasas))
+async def _answer_quietly(q, text: str | None = None) -> None:
+    try:
+        await q.answer(text)
+    except Exception:
+        pass
+
+# Callback handler for inline buttons
+async def on_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query
+    data = q.data or ""
+    if data.startswith("user_info:"):
+        # Show user info (placeholder for future enhancement); the answer toast is the whole reply
+        await _answer_quietly(q, "Vartotojo informacija")
+        return
+    
+    # Acknowledge the button while the action runs rather than one round trip before it
+    ack = asyncio.create_task(_answer_quietly(q, "Apdorojama…"))
+    try:
+        await _handle_button(update, context, q, data)
+    finally:
+        await ack
 
-    # Get specific plate details
-    async def cmd_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def _handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE, q, data: str):
+    if data.startswith("plate:"):
         if not await is_approved_user(update):
-            await update.message.reply_text("Jūsų prieiga dar nepatvirtinta.")
-            return
-        
-        args = context.args or []
-        if not args:
-            await update.message.reply_text("Naudojimas: /id <numeris>")
-            return
-        
-        plate = args[0].strip().upper()
-        vehicle_data = data_sync.get_vehicle_details(plate)
-        
-        if not vehicle_data or vehicle_data.get("excluded", False):
-            await update.message.reply_text("Numeris nerastas.")
             return
         
-        # Format response - show ALL possible parameters
-        lines = [f"{plate}:"]
-        today = dt.date.today()
-        
-        # Define all possible parameters that should be shown
-        all_parameters = [
-            ("lv_road_toll", "LV kelių mokestis"),
-            ("lt_road_toll", "LT kelių mokestis"), 
-            ("inspection", "Techninė apžiūra"),
-            ("insurance", "Draudimas"),
-            ("registration_certificate", "Registracijos liudijimas")
-        ]
-        
-        # Create lookup for existing events
-        events_lookup = {}
-        for event in vehicle_data["events"]:
-            events_lookup[event["event_type"]] = event
-        
-        # Display all parameters in consistent order
-        for event_type, label in all_parameters:
-            if event_type in events_lookup:
-                event = events_lookup[event_type]
-                expires = event.get("expires")
-                doc_links = event.get("doc_links", [])
-                
-                if event_type == "registration_certificate":
-                    # Special handling for registration certificate - show document links
-                    if doc_links:
-                        lines.append(f"- {label}:")
-                        for i, link in enumerate(doc_links, 1):
-                            lines.append(f"  Dokumentas {i}: {link}")
-                    else:
-                        lines.append(f"- {label}: (dokumentų nėra)")
-                else:
-                    # Regular event with expiry date
-                    if expires:
-                        try:
-                            exp_date = dt.datetime.fromisoformat(expires).date()
-                            if exp_date < today:
-                                status = "nebegalioja"
-                            else:
-                                status = f"galioja iki {exp_date.isoformat()}"
-                            lines.append(f"- {label}: {status}")
-                        except Exception:
-                            lines.append(f"- {label}: (data neteisinga)")
-                    else:
-                        lines.append(f"- {label}: (duomenų nėra)")
-            else:
-                # Parameter not found in data - show as missing
-                if event_type == "registration_certificate":
-                    lines.append(f"- {label}: (dokumentų nėra)")
-                else:
-                    lines.append(f"- {label}: (duomenų nėra)")
-        
-        await update.message.reply_text("\n".join(lines))
-
-    app.add_handler(CommandHandler('id', cmd_id))
-
-    # Admin update command
-    async def update_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
+        details = get_plate_details(data.split(":", 1)[1].strip().upper())
+        if details is None:
+            await q.edit_message_text("Numeris nerastas.")
             return
         
-        await update.message.reply_text("🔄 Atnaujinami duomenys...")
-        success, message = await data_sync.sync_from_google_sheets(force=True)
-        await update.message.reply_text(message)
-
-    app.add_handler(CommandHandler('update', update_cmd))
-
-    # Admin remove command
-    async def remove_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        args = context.args or []
-        if not args:
-            await update.message.reply_text("Naudojimas: /remove <numeris>")
-            return
-        
-        plate = args[0].strip().upper()
-        admin_name = update.effective_user.username or str(update.effective_user.id)
-        
-        success, message = data_sync.exclude_vehicle(plate, admin_name)
-        await update.message.reply_text(message)
-        
-        if success:
-            # Show updated exclusion list
-            excluded_list = data_sync.get_excluded_vehicles_list()
-            await update.message.reply_text(excluded_list)
-
-    app.add_handler(CommandHandler('remove', remove_cmd))
+        await q.edit_message_text(details)
+    
+    else:
+        action, _, arg = data.partition(":")
+        if action in USER_ACTIONS:
+            await _handle_user_action(update, context, q, action, arg)
+
+# Admin buttons from /pending and /users:
+# action -> (UsersRepo method, whether it takes the admin name, success text, failure text)
+USER_ACTIONS = {
+    "approve": ("approve", True, "✅ Vartotojas {} patvirtintas.", "❌ Nepavyko patvirtinti vartotojo {}."),
+    "reject": ("reject", True, "❌ Vartotojas {} atmestas.", "❌ Nepavyko atmesti vartotojo {}."),
+    "delete_user": ("delete_user", False, "🗑️ Vartotojas {} ištrintas.", "❌ Nepavyko ištrinti vartotojo {}."),
+}
 
-    # Callback handler for inline buttons
-    async def on_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        q = update.callback_query
+async def _handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE, q, action: str, arg: str):
+    if not is_admin(update):
+        return
+    
+    try:
+        user_id = int(arg)
+    except ValueError:
+        return
+    
+    if not SHEETS_CONFIGURED:
+        return
+    
+    method_name, takes_admin, ok_text, fail_text = USER_ACTIONS[action]
+    repo = await run_sheets_call(get_users_repo)
+    args = (user_id,)
+    if takes_admin:
+        args += (update.effective_user.username or str(update.effective_user.id),)
+    
+    success = await run_sheets_call(getattr(repo, method_name), *args)
+    if not success:
+        await q.edit_message_text(fail_text.format(user_id))
+        return
+    
+    # Clear user cache to reflect changes immediately
+    invalidate_users_cache()
+    await q.edit_message_text(ok_text.format(user_id))
+    
+    if action == "approve":
+        # Send welcome message to approved user
         try:
-            await q.answer("Apdorojama…")
-        except Exception:
-            pass
-        
-        data = q.data or ""
-        if data.startswith("plate:"):
-            if not await is_approved_user(update):
-                return
-            
-            plate = data.split(":", 1)[1].strip().upper()
-            vehicle_data = data_sync.get_vehicle_details(plate)
-            
-            if not vehicle_data or vehicle_data.get("excluded", False):
-                await q.edit_message_text("Numeris nerastas.")
-                return
-            
-            # Format detailed response - show ALL possible parameters
-            lines = [f"{plate}:"]
-            today = dt.date.today()
-            
-            # Define all possible parameters that should be shown
-            all_parameters = [
-                ("lv_road_toll", "LV kelių mokestis"),
-                ("lt_road_toll", "LT kelių mokestis"), 
-                ("inspection", "Techninė apžiūra"),
-                ("insurance", "Draudimas"),
-                ("registration_certificate", "Registracijos liudijimas")
-            ]
-            
-            # Create lookup for existing events
-            events_lookup = {}
-            for event in vehicle_data["events"]:
-                events_lookup[event["event_type"]] = event
-            
-            # Display all parameters in consistent order
-            for event_type, label in all_parameters:
-                if event_type in events_lookup:
-                    event = events_lookup[event_type]
-                    expires = event.get("expires")
-                    doc_links = event.get("doc_links", [])
-                    
-                    if event_type == "registration_certificate":
-                        # Special handling for registration certificate - show document links
-                        if doc_links:
-                            lines.append(f"- {label}:")
-                            for i, link in enumerate(doc_links, 1):
-                                lines.append(f"  Dokumentas {i}: {link}")
-                        else:
-                            lines.append(f"- {label}: (dokumentų nėra)")
-                    else:
-                        # Regular event with expiry date
-                        if expires:
-                            try:
-                                exp_date = dt.datetime.fromisoformat(expires).date()
-                                if exp_date < today:
-                                    status = "nebegalioja"
-                                else:
-                                    status = f"galioja iki {exp_date.isoformat()}"
-                                lines.append(f"- {label}: {status}")
-                            except Exception:
-                                lines.append(f"- {label}: (data neteisinga)")
-                        else:
-                            lines.append(f"- {label}: (duomenų nėra)")
-                else:
-                    # Parameter not found in data - show as missing
-                    if event_type == "registration_certificate":
-                        lines.append(f"- {label}: (dokumentų nėra)")
-                    else:
-                        lines.append(f"- {label}: (duomenų nėra)")
-            
-            await q.edit_message_text("\n".join(lines))
-        
-        elif data.startswith("approve:"):
-            # Approve user from pending list
-            if not is_admin(update):
-                return
-            
-            try:
-                user_id = int(data.split(":", 1)[1])
-            except ValueError:
-                return
-            
-            if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-                return
-            
-            client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-            repo = UsersRepo(client, cfg.users_tab_name)
-            admin_name = update.effective_user.username or str(update.effective_user.id)
-            
-            success = repo.approve(user_id, admin_name)
-            if success:
-                # Clear user cache to reflect changes immediately
-                _users_cache['approved_users'] = set()
-                _users_cache['timestamp'] = 0
-                await q.edit_message_text(f"✅ Vartotojas {user_id} patvirtintas.")
-                
-                # Send welcome message to approved user
-                try:
-                    from telegram import Bot
-                    bot = Bot(token=cfg.telegram_bot_token)
-                    welcome_msg = """
-🎉 Sveikiname! Jūsų prieiga patvirtinta.
-
-Galimos komandos:
-/info - Šiandienos priminimas
-/sarasas - Visų numerių sąrašas  
-/id <numeris> - Konkretaus numerio duomenys
+            await context.bot.send_message(chat_id=user_id, text=WELCOME_TEXT)
+        except Exception as e:
+            logger.error("Failed to send welcome message to %s: %s", user_id, e)
+
+# Whoami command
+async def whoami(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    u = update.effective_user
+    if not u:
+        return
+    await update.message.reply_text(f"user_id={u.id}, username={(u.username or '')}")
+
+# Admin pending users
+async def pending(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    if not SHEETS_CONFIGURED:
+        await update.message.reply_text(NO_SHEETS_CONFIG_TEXT)
+        return
+    
+    repo = await run_sheets_call(get_users_repo)
+    pending_users = await run_sheets_call(repo.list_pending)
+    
+    if not pending_users:
+        await update.message.reply_text("Nėra laukiančių vartotojų.")
+        return
+    
+    buttons = []
+    for user in pending_users:
+        username = user.telegram_username or str(user.telegram_user_id)
+        buttons.append([
+            InlineKeyboardButton(f"✅ {username}", callback_data=f"approve:{user.telegram_user_id}"),
+            InlineKeyboardButton(f"❌ {username}", callback_data=f"reject:{user.telegram_user_id}")
+        ])
+    
+    await update.message.reply_text(
+        f"Laukiantys vartotojai ({len(pending_users)}):",
+        reply_markup=InlineKeyboardMarkup(buttons)
+    )
+
+# Admin users management
+async def users_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    if not SHEETS_CONFIGURED:
+        await update.message.reply_text(NO_SHEETS_CONFIG_TEXT)
+        return
+    
+    all_users = await run_sheets_call(get_all_users)
+    
+    if not all_users:
+        await update.message.reply_text("Vartotojų nėra.")
+        return
+    
+    buttons = []
+    for user in all_users:
+        username = user.telegram_username or str(user.telegram_user_id)
+        status = user.status or "unknown"
+        status_emoji = {"approved": "✅", "pending": "⏳", "rejected": "❌"}.get(status, "❓")
+        
+        buttons.append([
+            InlineKeyboardButton(
+                f"{status_emoji} {username} ({status})", 
+                callback_data=f"user_info:{user.telegram_user_id}"
+            ),
+            InlineKeyboardButton(
+                "🗑️ Delete", 
+                callback_data=f"delete_user:{user.telegram_user_id}"
+            )
+        ])
+    
+    await update.message.reply_text(
+        f"Visi vartotojai ({len(all_users)}):",
+        reply_markup=InlineKeyboardMarkup(buttons)
+    )
+
+# Admin approve command
+async def approve_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    args = context.args or []
+    if not args:
+        await update.message.reply_text("Naudojimas: /approve <user_id>")
+        return
+    
+    try:
+        user_id = int(args[0])
+    except ValueError:
+        await update.message.reply_text("Neteisingas user_id.")
+        return
+    
+    if not SHEETS_CONFIGURED:
+        await update.message.reply_text(NO_SHEETS_CONFIG_TEXT)
+        return
+    
+    repo = await run_sheets_call(get_users_repo)
+    admin_name = update.effective_user.username or str(update.effective_user.id)
+    
+    success = await run_sheets_call(repo.approve, user_id, admin_name)
+    if success:
+        # Clear user cache to reflect changes immediately
+        invalidate_users_cache()
+        await update.message.reply_text(f"✅ Vartotojas {user_id} patvirtintas.")
+    else:
+        await update.message.reply_text(f"❌ Nepavyko patvirtinti vartotojo {user_id}.")
+
+# Manual send today command
+async def sendtoday_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text(NO_PERMISSION_TEXT)
+        return
+    
+    if not data_sync.is_data_available():
+        await update.message.reply_text(NO_DATA_ADMIN_TEXT)
+        return
+    
+    # Get processed data from JSON storage
+    tuples = data_sync.get_processed_data_for_reminders()
+    if not tuples:
+        await update.message.reply_text("📭 Nėra duomenų pranešimams.")
+        return
+    
+    # Process deadlines
+    upcoming, expired, text = get_today_summary()
+    
+    if text is EMPTY_SUMMARY_LT:
+        await update.message.reply_text("📭 Šiandien priminimų nėra.")
+        return
+    
+    # Send to all approved users
+    if not SHEETS_CONFIGURED:
+        await update.message.reply_text(NO_SHEETS_CONFIG_TEXT)
+        return
+    
+    repo = await run_sheets_call(get_users_repo)
+    chat_ids = await run_sheets_call(repo.list_approved_chat_ids)
+    
+    recipients = {chat_id: str(chat_id) for chat_id in chat_ids}
+    sent = await broadcast(context.bot, recipients, text)
+    
+    await update.message.reply_text(f"Išsiųsta {sent} vartotojams.")
+
+# Command name -> handler, registered in this order by main()
+COMMAND_HANDLERS = (
+    ('start', start),
+    ('pagalba', help_cmd),
+    ('dryrun', dryrun),
+    ('info', info_cmd),
+    ('sarasas', sarasas),
+    ('id', cmd_id),
+    ('update', update_cmd),
+    ('remove', remove_cmd),
+    ('whoami', whoami),
+    ('pending', pending),
+    ('users', users_cmd),
+    ('approve', approve_cmd),
+    ('sendtoday', sendtoday_cmd),
+)
 
-Botas automatiškai siųs priminimus kiekvieną dieną 8:00 val.
-                    """
-                    await bot.send_message(chat_id=user_id, text=welcome_msg.strip())
-                except Exception as e:
-                    print(f"Failed to send welcome message to {user_id}: {e}")
-            else:
-                await q.edit_message_text(f"❌ Nepavyko patvirtinti vartotojo {user_id}.")
-        
-        elif data.startswith("reject:"):
-            # Reject user from pending list
-            if not is_admin(update):
-                return
-            
-            try:
-                user_id = int(data.split(":", 1)[1])
-            except ValueError:
-                return
-            
-            if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-                return
-            
-            client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-            repo = UsersRepo(client, cfg.users_tab_name)
-            admin_name = update.effective_user.username or str(update.effective_user.id)
-            
-            success = repo.reject(user_id, admin_name)
-            if success:
-                await q.edit_message_text(f"❌ Vartotojas {user_id} atmestas.")
-            else:
-                await q.edit_message_text(f"❌ Nepavyko atmesti vartotojo {user_id}.")
-        
-        elif data.startswith("delete_user:"):
-            # Delete user from users list
-            if not is_admin(update):
-                return
-            
-            try:
-                user_id = int(data.split(":", 1)[1])
-            except ValueError:
-                return
-            
-            if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-                return
-            
-            client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-            repo = UsersRepo(client, cfg.users_tab_name)
-            
-            success = repo.delete_user(user_id)
-            if success:
-                # Clear user cache to reflect changes immediately
-                _users_cache['approved_users'] = set()
-                _users_cache['timestamp'] = 0
-                await q.edit_message_text(f"🗑️ Vartotojas {user_id} ištrintas.")
-            else:
-                await q.edit_message_text(f"❌ Nepavyko ištrinti vartotojo {user_id}.")
-        
-        elif data.startswith("user_info:"):
-            # Show user info (placeholder for future enhancement)
-            await q.answer("Vartotojo informacija")
+def main():
+    try:
+        run_bot()
+    finally:
+        # Flush whatever is still queued before the process exits
+        _log_listener.stop()
 
+def run_bot():
+    logger.info("🤖 Initializing Telegram bot...")
+    
+    # HTTP/2 lets concurrent sends (e.g. the daily fan-out) share one connection
+    request = HTTPXRequest(connection_pool_size=SEND_CONCURRENCY, http_version="2")
+    # Throttle all bot API calls to Telegram's 30 msg/s overall and 20 msg/min per group limits
+    rate_limiter = AIORateLimiter(
+        overall_max_rate=30,
+        overall_time_period=1,
+        group_max_rate=20,
+        group_time_period=60,
+        max_retries=3,
+    )
+    app = Application.builder().token(cfg.telegram_bot_token).request(request).rate_limiter(rate_limiter).build()
+    
+    app.add_error_handler(error_handler)
+    for command, handler in COMMAND_HANDLERS:
+        app.add_handler(CommandHandler(command, handler))
     app.add_handler(CallbackQueryHandler(on_cb))
-
-    # Whoami command
-    async def whoami(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        u = update.effective_user
-        if not u:
-            return
-        await update.message.reply_text(f"user_id={u.id}, username={(u.username or '')}")
-
-    app.add_handler(CommandHandler('whoami', whoami))
-
-    # Admin pending users
-    async def pending(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            await update.message.reply_text("Trūksta Sheets konfigūracijos.")
-            return
-        
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        pending_users = repo.list_pending()
-        
-        if not pending_users:
-            await update.message.reply_text("Nėra laukiančių vartotojų.")
-            return
-        
-        buttons = []
-        for user in pending_users:
-            username = user.telegram_username or str(user.telegram_user_id)
-            buttons.append([
-                InlineKeyboardButton(f"✅ {username}", callback_data=f"approve:{user.telegram_user_id}"),
-                InlineKeyboardButton(f"❌ {username}", callback_data=f"reject:{user.telegram_user_id}")
-            ])
-        
-        await update.message.reply_text(
-            f"Laukiantys vartotojai ({len(pending_users)}):",
-            reply_markup=InlineKeyboardMarkup(buttons)
-        )
-
-    app.add_handler(CommandHandler('pending', pending))
-
-    # Admin users management
-    async def users_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            await update.message.reply_text("Trūksta Sheets konfigūracijos.")
-            return
-        
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        all_users = repo.list_all()
-        
-        if not all_users:
-            await update.message.reply_text("Vartotojų nėra.")
-            return
-        
-        buttons = []
-        for user in all_users:
-            username = user.telegram_username or str(user.telegram_user_id)
-            status = user.status or "unknown"
-            status_emoji = {"approved": "✅", "pending": "⏳", "rejected": "❌"}.get(status, "❓")
-            
-            buttons.append([
-                InlineKeyboardButton(
-                    f"{status_emoji} {username} ({status})", 
-                    callback_data=f"user_info:{user.telegram_user_id}"
-                ),
-                InlineKeyboardButton(
-                    "🗑️ Delete", 
-                    callback_data=f"delete_user:{user.telegram_user_id}"
-                )
-            ])
-        
-        await update.message.reply_text(
-            f"Visi vartotojai ({len(all_users)}):",
-            reply_markup=InlineKeyboardMarkup(buttons)
-        )
-
-    app.add_handler(CommandHandler('users', users_cmd))
-
-    # Admin approve command
-    async def approve_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        args = context.args or []
-        if not args:
-            await update.message.reply_text("Naudojimas: /approve <user_id>")
-            return
-        
-        try:
-            user_id = int(args[0])
-        except ValueError:
-            await update.message.reply_text("Neteisingas user_id.")
-            return
-        
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            await update.message.reply_text("Trūksta Sheets konfigūracijos.")
-            return
-        
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        admin_name = update.effective_user.username or str(update.effective_user.id)
-        
-        success = repo.approve(user_id, admin_name)
-        if success:
-            # Clear user cache to reflect changes immediately
-            _users_cache['approved_users'] = set()
-            _users_cache['timestamp'] = 0
-            await update.message.reply_text(f"✅ Vartotojas {user_id} patvirtintas.")
-        else:
-            await update.message.reply_text(f"❌ Nepavyko patvirtinti vartotojo {user_id}.")
-
-    app.add_handler(CommandHandler('approve', approve_cmd))
-
-    # Manual send today command
-    async def sendtoday_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not is_admin(update):
-            await update.message.reply_text("Neturite teisės naudoti šios komandos.")
-            return
-        
-        if not data_sync.is_data_available():
-            await update.message.reply_text("❌ Duomenų nėra. Naudokite /update.")
-            return
-        
-        # Get processed data from JSON storage
-        tuples = data_sync.get_processed_data_for_reminders()
-        if not tuples:
-            await update.message.reply_text("📭 Nėra duomenų pranešimams.")
-            return
-        
-        # Process deadlines
-        latest = latest_by_plate_event(tuples)
-        today = dt.date.today()
-        upcoming, expired = compute_windows(today, latest)
-        text = format_summary_lt(upcoming, expired)
-        
-        if not text.strip() or "Šiandien priminimų nėra" in text:
-            await update.message.reply_text("📭 Šiandien priminimų nėra.")
-            return
-        
-        # Send to all approved users
-        if not (cfg.spreadsheet_id and cfg.google_credentials_path):
-            await update.message.reply_text("Trūksta Sheets konfigūracijos.")
-            return
-        
-        client = SheetsClient(cfg.spreadsheet_id, cfg.google_credentials_path)
-        repo = UsersRepo(client, cfg.users_tab_name)
-        approved = repo.list_approved()
-        
-        sent = 0
-        for user in approved:
-            if user.telegram_chat_id:
-                try:
-                    await context.bot.send_message(chat_id=user.telegram_chat_id, text=text)
-                    sent += 1
-                except Exception:
-                    pass
-        
-        await update.message.reply_text(f"Išsiųsta {sent} vartotojams.")
-
-    app.add_handler(CommandHandler('sendtoday', sendtoday_cmd))
-
+    
     # Schedule daily reminders
-    print("📅 Scheduling daily reminders for 08:00 Europe/Vilnius...", flush=True)
+    logger.info("📅 Scheduling daily reminders for 08:00 Europe/Vilnius...")
     
-    # Use pytz for accurate timezone handling
-    try:
-        import pytz
-        vilnius_tz = pytz.timezone('Europe/Vilnius')
-        # Convert 8:00 AM Vilnius time to UTC
-        vilnius_time = dt.datetime.now(vilnius_tz).replace(hour=8, minute=0, second=0, microsecond=0)
-        utc_time = vilnius_time.astimezone(pytz.UTC).time()
-        app.job_queue.run_daily(daily_job, time=utc_time)
-        print(f"✅ Daily reminders scheduled for {utc_time} UTC (08:00 Vilnius)", flush=True)
-    except ImportError:
-        # Fallback: Calculate UTC time manually
-        # Lithuania is UTC+2 (UTC+3 in summer DST)
-        now = dt.datetime.now()
-        if now.month >= 3 and now.month <= 10:  # Rough DST period
-            utc_hour = 8 - 3  # 05:00 UTC = 08:00 UTC+3
-        else:
-            utc_hour = 8 - 2  # 06:00 UTC = 08:00 UTC+2
-        
-        if utc_hour < 0:
-            utc_hour += 24
-        
-        app.job_queue.run_daily(daily_job, time=dt.time(utc_hour, 0))
-        print(f"✅ Daily reminders scheduled for {utc_hour:02d}:00 UTC (08:00 Vilnius)", flush=True)
+    # A tz-aware time makes the job queue resolve 08:00 in Vilnius on every run,
+    # so the schedule follows DST changes instead of a UTC offset fixed at startup
+    app.job_queue.run_daily(daily_job, time=dt.time(8, 0, tzinfo=VILNIUS_TZ))
+    logger.info("✅ Daily reminders scheduled for 08:00 Europe/Vilnius")
     
-    print("🤖 Starting bot...", flush=True)
-    sys.stdout.flush()
+    app.job_queue.run_repeating(users_refresh_job, interval=USERS_REFRESH_INTERVAL, first=_first_users_refresh_delay())
+    
+    logger.info("🤖 Starting bot...")
     
     # Start the bot
-    app.run_polling(drop_pending_updates=True)
+    if cfg.webhook_url:
+        # Telegram pushes updates to us; no outbound polling at all
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=cfg.webhook_port,
+            url_path=cfg.webhook_secret or "",
+            secret_token=cfg.webhook_secret,
+            webhook_url=cfg.webhook_url.rstrip("/") + "/" + (cfg.webhook_secret or ""),
+            drop_pending_updates=True,
+        )
+    else:
+        # Long polling: each getUpdates request is held open up to 30s instead of returning empty
+        app.run_polling(drop_pending_updates=True, poll_interval=0, timeout=30, bootstrap_retries=-1)
 
 if __name__ == '__main__':
     main()
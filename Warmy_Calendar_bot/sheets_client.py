@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Iterator
 
 import gspread
 from google.oauth2.service_account import Credentials
@@ -14,7 +18,58 @@ SCOPE = [
 ]
 
 
-@dataclass
+# Data tab columns read by read_data_rows, in RawRow field order (timestamp has an LT-header fallback)
+DATA_HEADERS = (
+    "Transport priemonė",
+    "Įvykis",
+    "Galiojimo terminas",
+    "Dokumentas",
+    "Dokumentas 2",
+    "Timestamp",
+    "Laiko žyma",
+)
+
+
+# Blocking gspread calls share a small pool so a burst of commands can't flood the Sheets quota
+_SHEETS_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sheets")
+
+
+def _column_letter(index: int) -> str:
+    """A1 column letters for a 0-based column index (0 -> A, 26 -> AA)"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+# Day zero of Sheets serial date numbers
+SHEETS_EPOCH = dt.datetime(1899, 12, 30)
+
+# Serials accepted as dates: 2000-01-01 up to 2100-01-01. Other numbers in a
+# date column (a typed 2025 or 20250105) are not dates and parse to None.
+SERIAL_MIN = 36526
+SERIAL_MAX = 73051
+
+
+def serial_to_datetime(serial: float) -> dt.datetime | None:
+    """Sheets serial number (days since 1899-12-30, fraction = time of day) to a datetime, None if implausible"""
+    if isinstance(serial, bool) or not SERIAL_MIN <= serial <= SERIAL_MAX:
+        return None
+    try:
+        return SHEETS_EPOCH + dt.timedelta(seconds=round(serial * 86400))
+    except (OverflowError, ValueError):
+        return None
+
+
+async def run_sheets_call(fn, *args):
+    """Run a blocking Sheets call on the shared worker pool, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_SHEETS_EXECUTOR, functools.partial(fn, *args))
+
+
+@dataclass(slots=True)
 class RawRow:
     plate: str
     event_raw: str
@@ -22,6 +77,9 @@ class RawRow:
     doc1: str | None
     doc2: str | None
     timestamp: str | None
+    # Already-typed values when Sheets returned a serial number instead of text
+    expiry: dt.date | None = None
+    ts: dt.datetime | None = None
 
 
 class SheetsClient:
@@ -29,28 +87,83 @@ class SheetsClient:
         creds = Credentials.from_service_account_file(credentials_path, scopes=SCOPE)
         self.gc = gspread.authorize(creds)
         self.spreadsheet = self.gc.open_by_key(spreadsheet_id)
+        self._header_cache: dict[str, list[str]] = {}  # tab name -> header row
 
-    def read_data_rows(self, tab_name: str) -> list[RawRow]:
+    def read_data_rows(self, tab_name: str) -> Iterator[RawRow]:
+        # Fetches eagerly (call this on the Sheets pool), builds RawRows lazily as the caller iterates
         ws = self.spreadsheet.worksheet(tab_name)
-        values = ws.get_all_records()
-        rows: list[RawRow] = []
-        for rec in values:
-            rows.append(
-                RawRow(
-                    plate=str(rec.get("Transport priemonė", "")).strip(),
-                    event_raw=str(rec.get("Įvykis", "")).strip(),
-                    expiry_raw=str(rec.get("Galiojimo terminas", "")).strip(),
-                    doc1=(rec.get("Dokumentas") or None),
-                    doc2=(rec.get("Dokumentas 2") or None),
-                    timestamp=(rec.get("Timestamp") or rec.get("Laiko žyma") or None),
+        header = self._header_cache.get(tab_name)
+        if header is None:
+            header = self._header_cache[tab_name] = ws.row_values(1)
+        col = {h: i for i, h in enumerate(header)}
+        wanted = [col[h] for h in DATA_HEADERS if h in col]
+        if not wanted:
+            # Nothing to read yet (e.g. empty tab); look at the header again next time
+            del self._header_cache[tab_name]
+            return iter(())
+        # Only fetch the span of columns we actually read
+        first, last = min(wanted), max(wanted)
+        # Unformatted values give dates as serial numbers, which skips string date parsing
+        values = ws.get(f"{_column_letter(first)}1:{_column_letter(last)}", value_render_option="UNFORMATTED_VALUE")
+        if not values or values[0] != header[first:last + 1]:
+            # Header row changed since it was cached; relearn the layout and read again
+            del self._header_cache[tab_name]
+            values = ws.get_all_values(value_render_option="UNFORMATTED_VALUE")
+            if not values:
+                return iter(())
+            self._header_cache[tab_name] = values[0]
+            col = {h: i for i, h in enumerate(values[0])}
+            first = 0
+        plate_i, event_i, expiry_i, doc1_i, doc2_i, ts_i, ts_lt_i = (
+            col[h] - first if h in col else None for h in DATA_HEADERS
+        )
+
+        def cell(row: list, i: int | None):
+            return row[i] if i is not None and i < len(row) else ""
+
+        def rows() -> Iterator[RawRow]:
+            for row in values[1:]:
+                expiry = cell(row, expiry_i)
+                ts = cell(row, ts_i) or cell(row, ts_lt_i)
+                expiry_serial = isinstance(expiry, (int, float))
+                ts_serial = isinstance(ts, (int, float))
+                # Numbers outside the plausible serial range end up as None, like unparsable text
+                expiry_dt = serial_to_datetime(expiry) if expiry_serial else None
+                yield RawRow(
+                    plate=str(cell(row, plate_i)).strip(),
+                    event_raw=str(cell(row, event_i)).strip(),
+                    expiry_raw="" if expiry_serial else str(expiry).strip(),
+                    doc1=(cell(row, doc1_i) or None),
+                    doc2=(cell(row, doc2_i) or None),
+                    timestamp=None if ts_serial else (str(ts) if ts else None),
+                    expiry=expiry_dt.date() if expiry_dt else None,
+                    ts=serial_to_datetime(ts) if ts_serial else None,
                 )
-            )
-        return rows
+
+        return rows()
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)  # expiry strings repeat heavily across rows
     def parse_mmddyyyy(date_text: str) -> dt.date | None:
         if not date_text:
             return None
+        # Fast path for the plain M/D/YYYY and M/D/YY shapes Sheets writes
+        parts = date_text.split("/")
+        if len(parts) == 3:
+            month, day, year = parts
+            if (
+                month.isascii() and month.isdigit() and len(month) <= 2
+                and day.isascii() and day.isdigit() and len(day) <= 2
+                and year.isascii() and year.isdigit() and len(year) in (2, 4)
+            ):
+                y = int(year)
+                if len(year) == 2:
+                    # Same pivot as strptime's %y
+                    y += 2000 if y < 69 else 1900
+                try:
+                    return dt.date(y, int(month), int(day))
+                except ValueError:
+                    return None
         for fmt in ("%m/%d/%Y", "%m/%d/%y"):
             try:
                 return dt.datetime.strptime(date_text, fmt).date()
@@ -69,3 +182,18 @@ class SheetsClient:
             return ws
 
 
+# Shared clients by (spreadsheet_id, credentials_path); the lock makes concurrent first calls build just one
+_clients: dict[tuple[str, str], SheetsClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_sheets_client(spreadsheet_id: str, credentials_path: str) -> SheetsClient:
+    """Shared client per spreadsheet/credentials pair; authorizes and opens the spreadsheet once"""
+    key = (spreadsheet_id, credentials_path)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = SheetsClient(spreadsheet_id, credentials_path)
+    return client
@@ -19,7 +19,7 @@ USERS_HEADERS = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class UserRow:
     telegram_user_id: int
     telegram_username: str | None
@@ -31,40 +31,60 @@ class UserRow:
     role: str | None
 
 
+def _row_from_record(rec: dict, user_id: int, status: str) -> UserRow:
+    return UserRow(
+        telegram_user_id=user_id,
+        telegram_username=(rec.get("telegram_username") or None),
+        telegram_chat_id=int(rec.get("telegram_chat_id")) if rec.get("telegram_chat_id") else None,
+        status=status,
+        approved_at=(rec.get("approved_at") or None),
+        approved_by=(rec.get("approved_by") or None),
+        invite_link_last_sent_at=(rec.get("invite_link_last_sent_at") or None),
+        role=(rec.get("role") or None),
+    )
+
+
+# Status of a removed user; the row stays in place so no row indexes shift
+DELETED_STATUS = "deleted"
+
+
 class UsersRepo:
     def __init__(self, client: SheetsClient, tab_name: str):
         self.client = client
         self.tab_name = tab_name
         self.ws = self.client.get_or_create_worksheet(tab_name, USERS_HEADERS)
 
+    def _records(self) -> list[dict]:
+        # Uncached: the bot caches users in one place (main.py) and invalidates that after writes
+        return self.ws.get_all_records()
+
+    def _update_row(self, a1_range: str, values: list) -> None:
+        # USER_ENTERED matches what update_cell() did for each cell
+        self.ws.batch_update([{"range": a1_range, "values": [values]}], value_input_option="USER_ENTERED")
+
     def find_by_user_id(self, user_id: int) -> Optional[tuple[int, UserRow]]:
-        values = self.ws.get_all_records()
+        values = self._records()
         for idx, rec in enumerate(values, start=2):
             try:
                 uid = int(rec.get("telegram_user_id", 0))
             except Exception:
                 uid = 0
             if uid == user_id:
-                return idx, UserRow(
-                    telegram_user_id=uid,
-                    telegram_username=(rec.get("telegram_username") or None),
-                    telegram_chat_id=int(rec.get("telegram_chat_id")) if rec.get("telegram_chat_id") else None,
-                    status=str(rec.get("status", "")).strip(),
-                    approved_at=(rec.get("approved_at") or None),
-                    approved_by=(rec.get("approved_by") or None),
-                    invite_link_last_sent_at=(rec.get("invite_link_last_sent_at") or None),
-                    role=(rec.get("role") or None),
-                )
+                status = str(rec.get("status", "")).strip()
+                if status != DELETED_STATUS:
+                    return idx, _row_from_record(rec, uid, status)
         return None
 
     def upsert_pending(self, user_id: int, username: str | None, chat_id: int | None) -> None:
         found = self.find_by_user_id(user_id)
         if found:
             row_idx, row = found
-            self.ws.update_cell(row_idx, 2, username or "")
-            self.ws.update_cell(row_idx, 3, chat_id or "")
+            # username, chat_id (and status if still empty) in one request
+            values = [username or "", chat_id or ""]
             if row.status == "":
-                self.ws.update_cell(row_idx, 4, "pending")
+                values.append("pending")
+            last_col = "D" if len(values) == 3 else "C"
+            self._update_row(f"B{row_idx}:{last_col}{row_idx}", values)
             return
         # append new
         self.ws.append_row([
@@ -83,9 +103,8 @@ class UsersRepo:
         if not found:
             return False
         row_idx, _ = found
-        self.ws.update_cell(row_idx, 4, "approved")
-        self.ws.update_cell(row_idx, 5, dt.datetime.now().isoformat(timespec="seconds"))
-        self.ws.update_cell(row_idx, 6, approved_by)
+        # status, approved_at, approved_by in one request
+        self._update_row(f"D{row_idx}:F{row_idx}", ["approved", dt.datetime.now().isoformat(timespec="seconds"), approved_by])
         return True
 
     def reject(self, user_id: int, rejected_by: str) -> bool:
@@ -93,85 +112,61 @@ class UsersRepo:
         if not found:
             return False
         row_idx, _ = found
-        self.ws.update_cell(row_idx, 4, "rejected")
-        self.ws.update_cell(row_idx, 5, dt.datetime.now().isoformat(timespec="seconds"))
-        self.ws.update_cell(row_idx, 6, rejected_by)
+        # status, approved_at, approved_by in one request
+        self._update_row(f"D{row_idx}:F{row_idx}", ["rejected", dt.datetime.now().isoformat(timespec="seconds"), rejected_by])
         return True
 
-    def list_pending(self) -> list[UserRow]:
-        values = self.ws.get_all_records()
-        result: list[UserRow] = []
+    def _buckets(self) -> tuple[list[UserRow], list[UserRow], list[UserRow]]:
+        """(pending, approved, all non-deleted) users, built in one pass over the records"""
+        values = self._records()
+        pending: list[UserRow] = []
+        approved: list[UserRow] = []
+        everyone: list[UserRow] = []
         for rec in values:
-            if str(rec.get("status", "")).strip() == "pending":
-                try:
-                    uid = int(rec.get("telegram_user_id", 0))
-                except Exception:
-                    uid = 0
-                result.append(
-                    UserRow(
-                        telegram_user_id=uid,
-                        telegram_username=(rec.get("telegram_username") or None),
-                        telegram_chat_id=int(rec.get("telegram_chat_id")) if rec.get("telegram_chat_id") else None,
-                        status="pending",
-                        approved_at=(rec.get("approved_at") or None),
-                        approved_by=(rec.get("approved_by") or None),
-                        invite_link_last_sent_at=(rec.get("invite_link_last_sent_at") or None),
-                        role=(rec.get("role") or None),
-                    )
-                )
-        return result
+            status = str(rec.get("status", "")).strip()
+            if status == DELETED_STATUS:
+                continue
+            try:
+                uid = int(rec.get("telegram_user_id", 0))
+            except Exception:
+                uid = 0
+            row = _row_from_record(rec, uid, status)
+            everyone.append(row)
+            if status == "pending":
+                pending.append(row)
+            elif status == "approved":
+                approved.append(row)
+        return pending, approved, everyone
+
+    def list_pending(self) -> list[UserRow]:
+        return self._buckets()[0]
 
     def list_approved(self) -> list[UserRow]:
-        values = self.ws.get_all_records()
-        result: list[UserRow] = []
-        for rec in values:
-            if str(rec.get("status", "")).strip() == "approved":
+        return self._buckets()[1]
+
+    def list_approved_chat_ids(self) -> list[int]:
+        # Broadcasts only need chat ids; skip building a UserRow per user
+        out: list[int] = []
+        for rec in self._records():
+            if str(rec.get("status", "")).strip() != "approved":
+                continue
+            cid = rec.get("telegram_chat_id")
+            if cid:
                 try:
-                    uid = int(rec.get("telegram_user_id", 0))
+                    out.append(int(cid))
                 except Exception:
-                    uid = 0
-                result.append(
-                    UserRow(
-                        telegram_user_id=uid,
-                        telegram_username=(rec.get("telegram_username") or None),
-                        telegram_chat_id=int(rec.get("telegram_chat_id")) if rec.get("telegram_chat_id") else None,
-                        status="approved",
-                        approved_at=(rec.get("approved_at") or None),
-                        approved_by=(rec.get("approved_by") or None),
-                        invite_link_last_sent_at=(rec.get("invite_link_last_sent_at") or None),
-                        role=(rec.get("role") or None),
-                    )
-                )
-        return result
+                    pass
+        return out
 
     def list_all(self) -> list[UserRow]:
-        values = self.ws.get_all_records()
-        result: list[UserRow] = []
-        for rec in values:
-            try:
-                uid = int(rec.get("telegram_user_id", 0))
-            except Exception:
-                uid = 0
-            result.append(
-                UserRow(
-                    telegram_user_id=uid,
-                    telegram_username=(rec.get("telegram_username") or None),
-                    telegram_chat_id=int(rec.get("telegram_chat_id")) if rec.get("telegram_chat_id") else None,
-                    status=str(rec.get("status", "")).strip(),
-                    approved_at=(rec.get("approved_at") or None),
-                    approved_by=(rec.get("approved_by") or None),
-                    invite_link_last_sent_at=(rec.get("invite_link_last_sent_at") or None),
-                    role=(rec.get("role") or None),
-                )
-            )
-        return result
+        return self._buckets()[2]
 
     def delete_user(self, user_id: int) -> bool:
         found = self.find_by_user_id(user_id)
         if not found:
             return False
         row_idx, _ = found
-        # Delete that row
-        self.ws.delete_rows(row_idx)
+        # Mark the row deleted rather than removing it: one cell write, and other rows keep their indexes
+        self._update_row(f"D{row_idx}:D{row_idx}", [DELETED_STATUS])
         return True
 